@@ -0,0 +1,216 @@
+# Offline analysis of the story graph: reachability, loops, dead ends and shortest wins
+#
+# Usage: python analyzer.py [story.json] [--json]
+import gc
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from scene_graph import load_story, STORY_FILE, SCENE, WIN
+
+
+def static_edges(story):
+    """Returns, per scene, the set of scenes any of its choices can lead to under some state."""
+    return [sorted({target for edge in scene_edges for target in (edge[2], edge[4])})
+            for scene_edges in story.edges]
+
+
+def reachable_from(edges, start):
+    """Returns the set of scenes reachable from start, ignoring conditions."""
+    seen = {start}
+    stack = [start]
+    while stack:
+        for target in edges[stack.pop()]:
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+
+def strongly_connected_components(edges):
+    """Tarjan's algorithm, iterative so deep stories don't hit the recursion limit."""
+    index_of = [-1] * len(edges)
+    low = [0] * len(edges)
+    on_stack = [False] * len(edges)
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(len(edges)):
+        if index_of[root] != -1:
+            continue
+        index_of[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(edges[root]))]
+        while work:
+            node, targets = work[-1]
+            for target in targets:
+                if index_of[target] == -1:
+                    index_of[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, iter(edges[target])))
+                    break
+                if on_stack[target] and index_of[target] < low[node]:
+                    low[node] = index_of[target]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def explore_states(story):
+    """Breadth-first search over scene x (inventory, companions) from the start of the story.
+
+    States are (scene, item mask, companion mask) tuples. Returns a dict mapping
+    each reached state to its (parent state, choice text), None for the start.
+    """
+    start = (story.start,) + story.apply_effects(story.start, 0, 0)
+    parents = {start: None}
+    queue = deque([start])
+    ends, effects, choices = story.ends, story.effects, story.choices
+    while queue:
+        state = queue.popleft()
+        scene, items, companions = state
+        if ends[scene] != SCENE:
+            continue # "Try Again"/"Play Again" leave the story graph
+        for text, target in choices(scene, items, companions).items():
+            if effects[target]:
+                next_state = (target,) + story.apply_effects(target, items, companions)
+            else:
+                next_state = (target, items, companions)
+            if next_state not in parents:
+                parents[next_state] = (state, text)
+                queue.append(next_state)
+    return parents
+
+
+def path_to(story, parents, state):
+    """Rebuilds the list of (scene name, choice text) steps that leads to state."""
+    steps = []
+    while parents[state] is not None:
+        state, text = parents[state]
+        steps.append((story.names[state[0]], text))
+    steps.reverse()
+    return steps
+
+
+def analyze(story):
+    """Runs every analysis and returns a JSON-friendly report."""
+    # The searches allocate many small tuples but never cycles, so the
+    # cyclic garbage collector would only burn time rescanning them
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _analyze(story)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _analyze(story):
+    started = time.perf_counter()
+    edges = static_edges(story)
+    names = story.names
+
+    reachable = reachable_from(edges, story.start)
+    unreachable = [names[s] for s in range(len(story)) if s not in reachable]
+    dead_ends = [names[s] for s in range(len(story)) if story.ends[s] == SCENE and not edges[s]]
+    loops = [sorted(names[s] for s in component) for component in strongly_connected_components(edges)
+             if len(component) > 1 or component[0] in edges[component[0]]]
+
+    # Scenes from which no win can ever be reached
+    reverse = [[] for _ in edges]
+    for scene, targets in enumerate(edges):
+        for target in targets:
+            reverse[target].append(scene)
+    wins = [s for s in range(len(story)) if story.ends[s] == WIN]
+    can_win = set(wins)
+    stack = list(wins)
+    while stack:
+        for source in reverse[stack.pop()]:
+            if source not in can_win:
+                can_win.add(source)
+                stack.append(source)
+    doomed = [names[s] for s in sorted(reachable) if story.ends[s] == SCENE and s not in can_win]
+
+    parents = explore_states(story)
+    reached_scenes = {state[0] for state in parents}
+    state_gated = [names[s] for s in sorted(reachable) if s not in reached_scenes]
+    winning_paths = []
+    for state in parents: # Insertion order is BFS order, so the first path per state is shortest
+        scene, items, companions = state
+        if story.ends[scene] == WIN:
+            winning_paths.append({"scene": names[scene], "inventory": story.items.names_of(items),
+                                  "companions": story.companions.names_of(companions),
+                                  "path": path_to(story, parents, state)})
+
+    return {
+        "scenes": len(story),
+        "transitions": sum(len(targets) for targets in edges),
+        "unreachable": unreachable,
+        "unreachable_with_conditions": state_gated,
+        "dead_ends": dead_ends,
+        "loops": loops,
+        "cannot_win": doomed,
+        "states_explored": len(parents),
+        "winning_paths": winning_paths,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def print_report(report):
+    """Prints a human-readable summary of an analyze() report."""
+    print(f"{report['scenes']} scenes, {report['transitions']} transitions, "
+          f"{report['states_explored']} (scene, inventory, companions) states "
+          f"analyzed in {report['elapsed_ms']} ms")
+    sections = [
+        ("Unreachable scenes", report["unreachable"]),
+        ("Reachable only if conditions were ignored", report["unreachable_with_conditions"]),
+        ("Dead ends (no choices, not an ending)", report["dead_ends"]),
+        ("Scenes that can never lead to a win", report["cannot_win"]),
+    ]
+    for title, scenes in sections:
+        print(f"\n{title}: {len(scenes)}")
+        for name in scenes:
+            print(f"  {name}")
+    print(f"\nLoops: {len(report['loops'])}")
+    for loop in report["loops"]:
+        print(f"  {' <-> '.join(loop)}")
+    print(f"\nShortest winning paths: {len(report['winning_paths'])}")
+    for win in report["winning_paths"]:
+        inventory = ", ".join(win["inventory"]) or "no items"
+        companions = ", ".join(win["companions"]) or "no companions"
+        print(f"\n  {win['scene']} with {inventory}; {companions} ({len(win['path'])} choices)")
+        for scene, choice in win["path"]:
+            print(f"    {scene}: {choice}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze the structure of a story file.")
+    parser.add_argument("story", nargs="?", default=STORY_FILE, help="story file (default: story.json)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = analyze(load_story(args.story))
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
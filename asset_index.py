@@ -0,0 +1,160 @@
+# In-memory index of the files in the asset folders, kept current while the game runs
+import os
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+# Seconds between checks of each folder's modification time when inotify isn't available
+POLL_INTERVAL = 2.0
+
+# inotify event bits (linux/inotify.h)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_CLOEXEC = 0o2000000
+# Files count as present once they're complete: written and closed, or renamed into place
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+# wd, mask, cookie, length of the name that follows
+_EVENT = struct.Struct("iIII")
+
+
+def _scan(directory):
+    """Returns the set of names in a folder (empty if it doesn't exist)."""
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+
+
+def _open_inotify():
+    """Returns (libc, inotify fd), or None where inotify isn't available."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    return (libc, fd) if fd >= 0 else None
+
+
+class AssetIndex:
+    """Which files the image and sound folders hold, answered from memory.
+
+    Each folder is scanned once; after that, presence checks are set lookups
+    instead of stat calls, which matters on network or synced home folders.
+    A watcher thread keeps the sets current, so art copied into a folder
+    while the game runs is picked up: on Linux through inotify, elsewhere
+    (or if inotify can't watch a folder) by polling the folder's modification
+    time and rescanning when it changes. Paths outside the watched folders
+    fall back to os.path.exists.
+    """
+
+    def __init__(self, directories, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._names = {os.path.abspath(directory): _scan(directory) for directory in directories}
+        self._stopped = threading.Event()
+        self._thread = None
+        self.mode = None # "inotify" or "polling" once started
+
+    def exists(self, path):
+        directory, name = os.path.split(os.path.abspath(path))
+        names = self._names.get(directory)
+        if names is None:
+            return os.path.exists(path)
+        return name in names
+
+    def add(self, path):
+        """Records a file the game itself just wrote, without waiting for the watcher to notice."""
+        directory, name = os.path.split(os.path.abspath(path))
+        names = self._names.get(directory)
+        if names is not None:
+            names.add(name)
+
+    # --- Watching ---
+
+    def start(self):
+        """Starts keeping the index current in a daemon thread."""
+        inotify = _open_inotify()
+        polled = list(self._names)
+        watches = {}
+        if inotify is not None:
+            libc, fd = inotify
+            for directory in self._names:
+                wd = libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK)
+                if wd >= 0:
+                    watches[wd] = directory
+            polled = [directory for directory in self._names if directory not in watches.values()]
+            if not watches:
+                os.close(fd)
+        if watches:
+            self.mode = "inotify"
+            target, args = self._watch, (fd, watches, polled)
+        else:
+            self.mode = "polling"
+            target, args = self._poll, (polled,)
+        self._thread = threading.Thread(target=target, args=args, name="asset-index", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stopped.set()
+
+    def _watch(self, fd, watches, polled):
+        """Watcher thread: applies inotify events, and polls any folders inotify couldn't watch."""
+        stamps = {directory: self._stamp(directory) for directory in polled}
+        try:
+            while not self._stopped.is_set():
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if ready:
+                    self._apply_events(os.read(fd, 64 * 1024), watches)
+                for directory in polled:
+                    stamps[directory] = self._rescan_if_changed(directory, stamps[directory])
+        finally:
+            os.close(fd)
+
+    def _apply_events(self, data, watches):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; start over from the folders themselves
+                for directory in watches.values():
+                    self._names[directory] = _scan(directory)
+                continue
+            names = self._names.get(watches.get(wd))
+            if names is None or mask & IN_IGNORED:
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                names.add(name)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                names.discard(name)
+
+    def _poll(self, directories):
+        """Watcher thread without inotify: rescans a folder whenever its modification time changes."""
+        stamps = {directory: self._stamp(directory) for directory in directories}
+        while not self._stopped.wait(self.poll_interval):
+            for directory in directories:
+                stamps[directory] = self._rescan_if_changed(directory, stamps[directory])
+
+    @staticmethod
+    def _stamp(directory):
+        try:
+            return os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _rescan_if_changed(self, directory, stamp):
+        current = self._stamp(directory)
+        if current != stamp:
+            self._names[directory] = _scan(directory)
+        return current
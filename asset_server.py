@@ -0,0 +1,47 @@
+# Local HTTP stand-in for the asset servers, shared by the benchmarks and the downloader tests
+import zlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    """Serves the class's payload at every URL, like a CDN: ETag, Last-Modified, Range and If-Range."""
+    protocol_version = "HTTP/1.1"
+    payload = b""
+    last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        etag = f'"{zlib.crc32(self.payload):08x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        start = 0
+        byte_range = self.headers.get("Range")
+        if self.headers.get("If-Range") not in (None, etag, self.last_modified):
+            byte_range = None # The client's partial copy is of another version; send all of this one
+        if byte_range:
+            start = int(byte_range.split("=")[1].split("-")[0])
+        body = self.payload[start:]
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_asset_server(payload, handler=AssetHandler):
+    """Serves payload at every URL on a local port, with an ETag so conditional GETs get a 304.
+
+    handler may be a subclass of AssetHandler that misbehaves on purpose.
+    Returns the server; assigning server.RequestHandlerClass.payload changes what it serves.
+    """
+    handler = type(handler.__name__, (handler,), {"payload": payload})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
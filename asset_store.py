@@ -0,0 +1,211 @@
+# Content-addressed asset store shared by every story pack and install
+#
+# Usage: python asset_store.py [--store DIR] [--verify] [--adopt]
+import os
+import sys
+import json
+import stat
+import shutil
+import hashlib
+import argparse
+import threading
+from save_store import atomic_write
+
+INDEX_FILE = "index.json"
+OBJECTS_DIR = "objects"
+# Stored objects are read-only, so nothing edits the copy every install shares
+OBJECT_MODE = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def file_digest(path):
+    """Returns the SHA-256 of a file as hex."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _clone(src, dst):
+    """Makes dst an independent copy of src, sharing its blocks where the filesystem can (a reflink)."""
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno()) # FICLONE
+    except (ImportError, OSError):
+        # Not Linux, or a filesystem without reflinks (or src and dst on different ones)
+        shutil.copyfile(src, dst)
+
+
+def _copy(src, dst, mode=None):
+    """Puts a copy of src at dst in one step, never a link, so editing either leaves the other alone."""
+    tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    _clone(src, tmp_path)
+    if mode is not None:
+        os.chmod(tmp_path, mode)
+    os.replace(tmp_path, dst)
+
+
+class AssetStore:
+    """Asset files kept once per distinct content, under the SHA-256 of their bytes.
+
+    index.json maps each asset's source URL to the hash of its content, so an
+    asset downloaded by one install or story pack is never downloaded again
+    by another, and identical art published under different names is stored
+    once. Objects are read-only, and the game's image and sound folders get
+    their own copies (reflinks where the filesystem supports them, so they
+    share blocks until edited); editing one never touches the store or any
+    other name. An object's hash is checked the first time it's read in a
+    session; a damaged one is deleted so it gets downloaded again.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, OBJECTS_DIR)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self._index = None
+        self._verified = set() # Digests whose objects have been checked this session
+        self._lock = threading.RLock()
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    # --- Index ---
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return index if isinstance(index, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable asset index {self.index_path}: {e}")
+            return {}
+
+    @property
+    def index(self):
+        """{asset key: content digest}, loaded on first use."""
+        if self._index is None:
+            self._index = self._read_index()
+        return self._index
+
+    def _write_index(self, changes):
+        """Applies changes ({key: digest, or None to drop it}) on top of what's on disk now.
+
+        Other installs may have added entries since this one read the index,
+        so those are merged in rather than overwritten.
+        """
+        index = self._read_index()
+        for key, digest in changes.items():
+            if digest is None:
+                index.pop(key, None)
+            else:
+                index[key] = digest
+        os.makedirs(self.root, exist_ok=True)
+        atomic_write(self.index_path, json.dumps(index, indent=1, sort_keys=True).encode("utf-8"))
+        self._index = index
+
+    def lookup(self, key):
+        """Returns the digest stored for key, or None."""
+        return self.index.get(key)
+
+    # --- Objects ---
+
+    def verify(self, digest):
+        """Returns True if the object for digest exists and still has that hash.
+
+        A damaged object is deleted, along with the index entries pointing at
+        it, so the asset is downloaded again rather than shown broken.
+        """
+        if digest in self._verified:
+            return True
+        path = self.object_path(digest)
+        try:
+            intact = file_digest(path) == digest
+        except FileNotFoundError:
+            intact = False
+        with self._lock:
+            if intact:
+                st = os.stat(path)
+                if st.st_nlink > 1 or st.st_mode & 0o222:
+                    # Linked into an image or sound folder by an older version; give the store its own copy
+                    _copy(path, path, OBJECT_MODE)
+                self._verified.add(digest)
+                return True
+            if os.path.exists(path):
+                print(f"Warning: Asset {digest[:12]} is damaged; it will be downloaded again")
+                os.chmod(path, stat.S_IWRITE) # Windows won't delete a read-only file
+                os.remove(path)
+            stale = {key: None for key, value in self.index.items() if value == digest}
+            if stale:
+                self._write_index(stale)
+        return False
+
+    def add(self, key, path):
+        """Stores a read-only copy of the file at path under key, leaving path as it is. Returns the digest.
+
+        If the store already holds the same content (under any key), it isn't
+        stored twice.
+        """
+        digest = file_digest(path)
+        obj = self.object_path(digest)
+        with self._lock:
+            if not (os.path.exists(obj) and self.verify(digest)):
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                _copy(path, obj, OBJECT_MODE)
+                self._verified.add(digest)
+            if self.index.get(key) != digest:
+                self._write_index({key: digest})
+        return digest
+
+    def materialize(self, key, path):
+        """Puts a writable copy of the stored content for key at path. Returns False if the store doesn't have it intact."""
+        digest = self.lookup(key)
+        if digest is None or not self.verify(digest):
+            return False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        _copy(self.object_path(digest), path)
+        return True
+
+    def objects(self):
+        """Yields the digest of every object in the store."""
+        if not os.path.isdir(self.objects_dir):
+            return
+        for prefix in sorted(os.listdir(self.objects_dir)):
+            folder = os.path.join(self.objects_dir, prefix)
+            for name in sorted(os.listdir(folder)):
+                if name.startswith(prefix) and not name.endswith(".tmp"):
+                    yield name
+
+
+def main(argv=None):
+    from scene_graph import load_story
+    from assets import build_manifest
+
+    desktop = os.path.join(os.path.expanduser("~"), "Desktop")
+    parser = argparse.ArgumentParser(description="Inspect, check or fill the shared asset store.")
+    parser.add_argument("--store", default=os.path.join(desktop, "adventure_assets"), help="store folder")
+    parser.add_argument("--verify", action="store_true", help="re-hash every stored file and drop damaged ones")
+    parser.add_argument("--adopt", action="store_true",
+                        help="copy the story's already-downloaded images and sounds into the store")
+    parser.add_argument("--story", help="story file whose assets --adopt looks for")
+    args = parser.parse_args(argv)
+
+    store = AssetStore(args.store)
+    if args.adopt:
+        story = load_story(args.story) if args.story else load_story()
+        manifest = build_manifest(story, os.path.join(desktop, "images"), os.path.join(desktop, "sounds"))
+        adopted = [entry for entry in manifest if os.path.exists(entry["path"])]
+        for entry in adopted:
+            store.add(entry["url"], entry["path"])
+        print(f"Adopted {len(adopted)} assets")
+    if args.verify:
+        damaged = [digest for digest in list(store.objects()) if not store.verify(digest)]
+        print(f"{len(damaged)} damaged objects removed")
+
+    digests = list(store.objects())
+    size = sum(os.path.getsize(store.object_path(digest)) for digest in digests)
+    print(f"{len(store.index)} assets stored as {len(digests)} distinct files ({size / 2**20:.1f} MB) in {args.store}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
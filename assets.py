@@ -0,0 +1,305 @@
+# Asset manifest and concurrent, resumable downloader
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from save_store import atomic_write
+from atlas import source_stamp
+
+# Define URLs for default sounds
+SOUND_URLS = {
+    "button_click.wav": "https://www.soundjay.com/buttons/button-1.wav",
+    "scene_change.wav": "https://www.soundjay.com/misc/wind-chime-1.wav",
+    "win.wav": "https://www.soundjay.com/misc/bell-ringing-05.wav",
+    "lose.wav": "https://www.soundjay.com/misc/fail-trombone-01.wav"
+}
+MENU_MUSIC_FILE = "menu_music.mp3"
+MENU_MUSIC_URL = "https://www.soundjay.com/music/sounds/dream-a-little-dream-of-me-jazz-version-115.mp3"
+MENU_IMAGE_FILE = "main_menu.png"
+
+CHUNK_SIZE = 64 * 1024
+# Seconds a downloaded asset is trusted before the server is asked whether it has changed, by manifest kind
+REVALIDATE_AFTER = {"image": 24 * 3600, "sound": 7 * 24 * 3600, "music": 30 * 24 * 3600}
+# Cache metadata (ETag, Last-Modified, when it was last checked, the file's mtime and size) lives next to each
+# asset in "<file>.meta"
+META_SUFFIX = ".meta"
+
+
+def image_url(image_file):
+    """Returns the download URL for a scene image."""
+    # Using a placeholder service for demonstration.
+    # You would replace this with your actual image URLs.
+    return f"https://via.placeholder.com/800x600.png/000000/FFFFFF?text={quote(image_file.replace('.png', ''))}"
+
+
+def build_manifest(story, image_dir, sound_dir):
+    """Lists every asset the game and story use as {"kind", "name", "url", "path"} dicts."""
+    manifest = []
+    images = [MENU_IMAGE_FILE] + sorted(set(story.images))
+    for image_file in dict.fromkeys(images):
+        manifest.append({"kind": "image", "name": image_file, "url": image_url(image_file),
+                         "path": os.path.join(image_dir, image_file)})
+    for sound_file, url in SOUND_URLS.items():
+        manifest.append({"kind": "sound", "name": sound_file, "url": url,
+                         "path": os.path.join(sound_dir, sound_file)})
+    manifest.append({"kind": "music", "name": MENU_MUSIC_FILE, "url": MENU_MUSIC_URL,
+                     "path": os.path.join(sound_dir, MENU_MUSIC_FILE)})
+    return manifest
+
+
+def downloaded_images(story, image_dir):
+    """Returns the paths of the menu and scene images already in image_dir, saying how many aren't."""
+    names = dict.fromkeys([MENU_IMAGE_FILE] + sorted(set(story.images)))
+    paths = [os.path.join(image_dir, name) for name in names]
+    present = [path for path in paths if os.path.exists(path)]
+    missing = len(paths) - len(present)
+    if missing:
+        print(f"Skipping {missing} images that aren't downloaded yet (run with --fetch-assets first)")
+    return present
+
+
+def read_meta(file_path):
+    """Returns the cache metadata saved with a downloaded asset, or {} if there is none."""
+    try:
+        with open(file_path + META_SUFFIX, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta if isinstance(meta, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(file_path, meta):
+    atomic_write(file_path + META_SUFFIX, json.dumps(meta).encode("utf-8"))
+
+
+def _validators(response):
+    return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def _if_range(meta, url):
+    """Returns the validator to send as If-Range for a partial download, or None if it can't be resumed safely."""
+    if meta.get("url") != url:
+        return None
+    etag = meta.get("etag")
+    # If-Range only takes strong ETags
+    if etag and not etag.startswith("W/"):
+        return etag
+    return meta.get("last_modified")
+
+
+def _discard_part(part_path):
+    """Deletes a partial download and the validators saved with it."""
+    for path in (part_path, part_path + META_SUFFIX):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _save_meta(url, file_path, validators):
+    """Records the validators the server sent with an asset, for later conditional requests.
+
+    The file's stamp is kept too, so an asset changed by anyone but the
+    downloader is left alone from then on.
+    """
+    _write_meta(file_path, dict(validators, url=url, checked=time.time(), stamp=source_stamp(file_path)))
+
+
+def _write_body(response, part_path, mode):
+    with open(part_path, mode) as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class Downloader:
+    """Downloads assets over a pooled session, resuming partial files with HTTP Range requests.
+
+    Data is written to "<file>.part" and renamed into place only once complete,
+    so an interrupted download never leaves a truncated asset behind.
+    requests is only imported once something actually needs downloading.
+    With an AssetStore (see asset_store.py), assets it already holds are
+    linked into place instead of downloaded, and new downloads are added to it.
+    revalidate_after overrides REVALIDATE_AFTER for some kinds of asset.
+    """
+
+    def __init__(self, max_workers=4, retries=3, timeout=15, store=None, revalidate_after=None):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.timeout = timeout
+        self.store = store
+        self.revalidate_after = dict(REVALIDATE_AFTER, **(revalidate_after or {}))
+        self._session = None
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def session(self):
+        """The pooled requests.Session, created on first use."""
+        with self._locks_guard:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def close(self):
+        """Stops a revalidate_all() pass early, e.g. when the game quits."""
+        self._stopped.set()
+
+    def _lock_for(self, path):
+        """Returns a per-file lock so two threads never write the same .part file."""
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def fetch(self, url, file_path):
+        """Downloads url to file_path unless it already exists. Returns True on success."""
+        if os.path.exists(file_path):
+            return True
+        with self._lock_for(file_path):
+            if os.path.exists(file_path): # Another thread got there first
+                return True
+            if self.store is not None and self.store.materialize(url, file_path):
+                return True
+            print(f"Downloading missing asset: {os.path.basename(file_path)}...")
+            session = self.session
+            import requests
+            error = None
+            for _ in range(self.retries):
+                try:
+                    validators = self._download(session, url, file_path)
+                    break
+                except (requests.exceptions.RequestException, OSError) as e:
+                    error = e
+            else:
+                print(f"Error downloading {url}: {error}")
+                return False
+            print(f"Download complete: {os.path.basename(file_path)}")
+            self._keep(url, file_path, validators)
+            return True
+
+    def _download(self, session, url, file_path):
+        """One download attempt, continuing from whatever a previous attempt left in the .part file.
+
+        The validators of the version being downloaded are kept in
+        "<file>.part.meta" and sent as If-Range, so a partial file is only
+        continued with the rest of that same version. Returns the validators
+        once the asset is complete at file_path.
+        """
+        import requests
+        part_path = file_path + ".part"
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part_meta = read_meta(part_path)
+        if_range = _if_range(part_meta, url) if offset else None
+        # Without a validator there's no telling which version the partial file is of, so start over
+        headers = {"Range": f"bytes={offset}-", "If-Range": if_range} if if_range else {}
+
+        with session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and headers:
+                # Nothing left to send, provided the .part file holds the whole asset
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                if total != str(offset):
+                    _discard_part(part_path)
+                    raise requests.exceptions.HTTPError(
+                        f"416: partial file is {offset} bytes, the asset {total or 'unknown'}", response=response)
+                validators = {"etag": part_meta.get("etag"), "last_modified": part_meta.get("last_modified")}
+            else:
+                response.raise_for_status()
+                validators = _validators(response)
+                if response.status_code != 206:
+                    # A new version, or the server ignored Range: start over, remembering which version this is
+                    _write_meta(part_path, dict(validators, url=url))
+                _write_body(response, part_path, 'ab' if response.status_code == 206 else 'wb')
+        os.replace(part_path, file_path)
+        _discard_part(part_path)
+        return validators
+
+    def _keep(self, url, file_path, validators):
+        """Adds a freshly downloaded asset to the store and saves its validators.
+
+        The asset is already in place by now, so failing to record it is only
+        a warning; it never makes the download count as failed or run again.
+        """
+        if self.store is not None:
+            try:
+                self.store.add(url, file_path)
+            except OSError as e:
+                print(f"Warning: Could not add {os.path.basename(file_path)} to the asset store: {e}")
+        try:
+            _save_meta(url, file_path, validators)
+        except OSError as e:
+            print(f"Warning: Could not save cache metadata for {os.path.basename(file_path)}: {e}")
+
+    def fetch_all(self, manifest):
+        """Downloads every missing manifest entry in parallel. Returns the entries that failed."""
+        missing = [entry for entry in manifest if not os.path.exists(entry["path"])]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download") as pool:
+            results = list(pool.map(lambda entry: self.fetch(entry["url"], entry["path"]), missing))
+        return [entry for entry, ok in zip(missing, results) if not ok]
+
+    def revalidate(self, entry):
+        """Asks the server whether a downloaded manifest entry has changed, once it's due.
+
+        Only files this downloader fetched are checked: ones with a .meta for
+        the same URL holding an ETag or Last-Modified, and still the size and
+        modification time recorded there. Art the player put in place or
+        edited is never touched. The validators go out as If-None-Match and
+        If-Modified-Since, so an unchanged asset costs one 304 response with
+        no body. A changed one is downloaded next to the old file and swapped
+        in once complete. Returns True if a new version was downloaded.
+        """
+        url, file_path = entry["url"], entry["path"]
+        with self._lock_for(file_path):
+            if self._stopped.is_set():
+                return False
+            meta = read_meta(file_path)
+            if meta.get("url") != url or not (meta.get("etag") or meta.get("last_modified")):
+                return False
+            if source_stamp(file_path) != meta.get("stamp"):
+                return False # Missing (fetch()'s job), or changed since it was downloaded
+            if time.time() - meta.get("checked", 0) < self.revalidate_after.get(entry["kind"], 0):
+                return False
+            headers = {}
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            import requests
+            part_path = file_path + ".part"
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304:
+                        meta["checked"] = time.time()
+                        _write_meta(file_path, meta)
+                        return False
+                    response.raise_for_status()
+                    _write_body(response, part_path, 'wb')
+                if self._stopped.is_set():
+                    os.remove(part_path)
+                    return False
+                # Replacing the file rather than rewriting it leaves the asset store's copy untouched
+                os.replace(part_path, file_path)
+            except (requests.exceptions.RequestException, OSError) as e:
+                print(f"Could not check {os.path.basename(file_path)} for updates: {e}")
+                return False
+            print(f"Updated asset: {os.path.basename(file_path)}")
+            self._keep(url, file_path, _validators(response))
+            return True
+
+    def revalidate_all(self, manifest):
+        """Revalidates every downloaded manifest entry that's due, in parallel. Returns the updated entries.
+
+        After close(), the entries not yet started are skipped.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="revalidate") as pool:
+            results = list(pool.map(self.revalidate, manifest))
+        return [entry for entry, updated in zip(manifest, results) if updated]
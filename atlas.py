@@ -0,0 +1,205 @@
+# Memory-mapped texture atlas: all scene art decoded ahead of time into one file
+import os
+import sys
+import mmap
+import json
+import struct
+import argparse
+import threading
+from PIL import Image
+from image_cache import LANCZOS, decode_image
+
+MAGIC = b"CYAT"
+VERSION = 1
+ATLAS_FILE = "scenes.atlas"
+# Window sizes the art is pre-scaled to: the default window and the largest one allowed
+STANDARD_SIZES = ((800, 600), (1200, 900))
+# Pixel blocks start on page boundaries so each one maps onto whole pages
+PAGE_SIZE = mmap.ALLOCATIONGRANULARITY
+
+# magic, version, index offset, index length
+_HEADER = struct.Struct("<4sBxxxQQ")
+# Modes Pillow can wrap around a buffer without copying it, and their bytes per pixel
+_MAPPED_MODES = {"RGBX": 4, "RGBA": 4, "L": 1}
+
+
+def source_stamp(path):
+    """Identifies the version of a source file, or None if it isn't there."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _pixels(img):
+    """Returns (mode, raw bytes) in a layout Image.frombuffer can map directly."""
+    mode = img.mode
+    if mode not in _MAPPED_MODES:
+        mode = "RGBX" # The same layout Pillow uses for RGB internally
+        img = img.convert("RGB")
+    return mode, img.tobytes("raw", mode)
+
+
+class AtlasWriter:
+    """Writes an atlas file one image at a time.
+
+    The file is written next to out_path and renamed into place by close(),
+    so a running game never maps a half-written atlas.
+    """
+
+    def __init__(self, out_path, sizes=()):
+        self.out_path = out_path
+        self.index = {"sizes": [list(size) for size in sizes], "images": {}}
+        self._tmp_path = f"{out_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(b"\0" * _HEADER.size)
+
+    def add(self, name, source_stamp, levels):
+        """Adds an image as a list of decoded levels, the image at its own size first."""
+        f = self._file
+        entry = {}
+        for level in levels:
+            key = f"{level.width}x{level.height}"
+            if key in entry:
+                continue
+            mode, data = _pixels(level)
+            offset = f.tell()
+            offset += -offset % PAGE_SIZE
+            f.seek(offset)
+            f.write(data)
+            entry[key] = [offset, level.width, level.height, mode]
+        self.index["images"][name] = {
+            "source": source_stamp,
+            "original": f"{levels[0].width}x{levels[0].height}",
+            "levels": entry,
+        }
+
+    def close(self):
+        index_data = json.dumps(self.index).encode("utf-8")
+        f = self._file
+        index_offset = f.tell()
+        f.write(index_data)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, index_offset, len(index_data)))
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(self._tmp_path, self.out_path)
+
+
+def build_atlas(image_paths, out_path, sizes=STANDARD_SIZES):
+    """Decodes every image at its own size and at each of sizes into one atlas file.
+
+    Returns the number of images packed.
+    """
+    writer = AtlasWriter(out_path, sizes)
+    for path in image_paths:
+        img = decode_image(path)
+        levels = [img] + [img.resize(size, LANCZOS) for size in sizes if tuple(size) != img.size]
+        writer.add(os.path.basename(path), source_stamp(path), levels)
+    writer.close()
+    return len(writer.index["images"])
+
+
+class TextureAtlas:
+    """Read-only view of an atlas file built by build_atlas().
+
+    Images come back as Pillow images wrapped directly around the mapped file,
+    so nothing is decoded or copied, and every game process shares the same
+    pages through the OS page cache. An entry whose source PNG has changed
+    since the atlas was built is ignored in favour of the PNG.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_offset, index_length = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a texture atlas this version of the game can read")
+        index = json.loads(self._map[index_offset:index_offset + index_length])
+        self.sizes = [tuple(size) for size in index["sizes"]]
+        self._images = index["images"]
+        self._checked = {} # image path -> whether the atlas copy is still current
+
+    @classmethod
+    def open(cls, path):
+        """Opens the atlas at path, or returns None (with a warning if it's unreadable)."""
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Ignoring texture atlas {path}: {e}")
+            return None
+
+    def __contains__(self, image_file):
+        return image_file in self._images
+
+    def _entry(self, path):
+        """Returns the index entry for an image path if the atlas copy can be used."""
+        entry = self._images.get(os.path.basename(path))
+        if entry is None:
+            return None
+        current = self._checked.get(path)
+        if current is None:
+            stamp = source_stamp(path)
+            # A missing source means only the atlas copy is installed
+            current = stamp is None or stamp == entry["source"]
+            self._checked[path] = current
+        return entry if current else None
+
+    def _image(self, level):
+        offset, width, height, mode = level
+        size = width * height * _MAPPED_MODES[mode]
+        buffer = memoryview(self._map)[offset:offset + size]
+        return Image.frombuffer(mode, (width, height), buffer, "raw", mode, 0, 1)
+
+    def sizes_of(self, path):
+        """Returns the sizes stored for an image, or None if the atlas can't supply it."""
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        return [(width, height) for _, width, height, _ in entry["levels"].values()]
+
+    def original(self, path):
+        """Returns the image at its own size, or None if the atlas can't supply it."""
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        return self._image(entry["levels"][entry["original"]])
+
+    def scaled(self, path, size):
+        """Returns the image pre-scaled to size, or None if the atlas has no such level."""
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        level = entry["levels"].get(f"{size[0]}x{size[1]}")
+        return self._image(level) if level is not None else None
+
+
+def main(argv=None):
+    from scene_graph import load_story
+    from assets import downloaded_images
+
+    parser = argparse.ArgumentParser(description="Pack the scene art into a memory-mapped texture atlas.")
+    parser.add_argument("--images", default=os.path.join(os.path.expanduser("~"), "Desktop", "images"),
+                        help="folder holding the scene PNGs")
+    parser.add_argument("--out", help=f"atlas file to write (default: <images>/{ATLAS_FILE})")
+    parser.add_argument("--story", help="story file listing the scene images")
+    args = parser.parse_args(argv)
+
+    story = load_story(args.story) if args.story else load_story()
+    present = downloaded_images(story, args.images)
+    if not present:
+        return 1
+    out_path = args.out or os.path.join(args.images, ATLAS_FILE)
+    count = build_atlas(present, out_path)
+    print(f"Packed {count} images into {out_path} ({os.path.getsize(out_path) / 2**20:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# Non-blocking sound effects and music on top of pygame.mixer
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from assets import MENU_MUSIC_FILE
+from instrumentation import PROFILER
+
+# Sound effects by name: (file, priority). Effects overlap on pygame's free
+# channels; a repeated effect restarts instead of stacking up, and only when
+# every channel is busy does an effect cut off a less important one.
+SOUND_EFFECTS = {
+    "click": ("button_click.wav", 0),
+    "scene_change": ("scene_change.wav", 1),
+    "win": ("win.wav", 2),
+    "lose": ("lose.wav", 2),
+}
+
+# Try to initialize the mixer with a few common settings
+MIXER_CONFIGS = [
+    {'frequency': 44100, 'size': -16, 'channels': 2, 'buffer': 512},
+    {'frequency': 22050, 'size': -16, 'channels': 2, 'buffer': 512},
+    {}, # Default
+]
+
+
+class NullSound:
+    """Stands in for a sound that couldn't be loaded; playing it does nothing."""
+    __slots__ = ()
+
+    def play(self, *args, **kwargs):
+        return None
+
+    def stop(self):
+        pass
+
+    def get_length(self):
+        return 0.0
+
+
+NULL_SOUND = NullSound()
+
+
+class AudioManager:
+    """Starts pygame's mixer and decodes sounds on a worker thread.
+
+    Nothing here blocks the Tk thread: until the worker has finished starting
+    up, effects are skipped and a music request is remembered and honoured
+    once the music has loaded.
+    """
+
+    def __init__(self, fetch, startup=None, on_ready=None):
+        self.fetch = fetch # sound file name -> local path, or None if it's unavailable
+        self.startup = startup
+        self.on_ready = on_ready
+        self.enabled = False
+        self.ready = threading.Event()
+        self.pygame = None
+        self._sounds = {} # Decoded sounds shared by every effect that uses the file
+        self._playing = {} # effect name -> the channel it was last played on
+        self._music_loaded = False
+        self._music_wanted = False
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio")
+
+    def start(self):
+        """Starts the mixer and loads every sound on the worker thread."""
+        self._worker.submit(self._start)
+
+    def _phase(self, name):
+        if self.startup is None:
+            return nullcontext()
+        return self.startup.phase(name)
+
+    def _start(self):
+        with self._phase("import pygame"):
+            import pygame
+            self.pygame = pygame
+
+        with self._phase("init mixer"):
+            for config in MIXER_CONFIGS:
+                try:
+                    pygame.mixer.init(**config)
+                    print(f"Pygame mixer initialized successfully with settings: {pygame.mixer.get_init()}")
+                    break # Success, exit the loop
+                except (NotImplementedError, pygame.error):
+                    continue # Try next config
+            else: # This 'else' belongs to the 'for' loop, runs if loop completes without break
+                print("="*60)
+                print("WARNING: Pygame mixer could not be initialized. Sound will be disabled.")
+                print("\nThis usually means there's an issue with your Pygame installation or audio drivers.")
+                print("On macOS, the recommended fix is to use Homebrew to install dependencies:")
+                print("brew install sdl2 sdl2_image sdl2_mixer sdl2_ttf portmidi")
+                print("Then, reinstall pygame: python -m pip install --force-reinstall pygame")
+                print("="*60)
+                self._finish_start()
+                return
+
+        with self._phase("load sounds"):
+            for sound_file, _ in SOUND_EFFECTS.values():
+                self._decode(sound_file)
+        with self._phase("load menu music"):
+            path = self.fetch(MENU_MUSIC_FILE)
+            if path is not None:
+                pygame.mixer.music.load(path)
+                self._music_loaded = True
+
+        with self._lock:
+            self.enabled = True
+            if self._music_wanted and self._music_loaded:
+                pygame.mixer.music.play(loops=-1)
+        self._finish_start()
+
+    def _finish_start(self):
+        self.ready.set()
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def _decode(self, sound_file):
+        """Worker thread: decodes a sound file into the shared cache."""
+        if sound_file in self._sounds:
+            return self._sounds[sound_file]
+        path = self.fetch(sound_file)
+        sound = NULL_SOUND
+        if path is not None:
+            try:
+                sound = self.pygame.mixer.Sound(path)
+            except self.pygame.error as e:
+                print(f"Warning: Could not decode sound file at {path}: {e}")
+        self._sounds[sound_file] = sound
+        return sound
+
+    def sound(self, sound_file):
+        """Returns the decoded sound for a file, or NULL_SOUND if it isn't decoded (yet)."""
+        return self._sounds.get(sound_file, NULL_SOUND)
+
+    def play(self, name):
+        """Plays a sound effect from SOUND_EFFECTS without blocking."""
+        if not self.enabled:
+            return
+        sound_file, priority = SOUND_EFFECTS[name]
+        sound = self._sounds.get(sound_file)
+        if sound is None:
+            # Not decoded yet: decode in the background and skip this one
+            self._worker.submit(self._decode, sound_file)
+            return
+        if sound is NULL_SOUND:
+            return
+        with PROFILER.phase("play sound"):
+            channel = self._playing.get(name)
+            if channel is None or channel.get_sound() is not sound:
+                channel = self.pygame.mixer.find_channel() or self._preemptible(priority)
+                if channel is None:
+                    return # Every channel is busy with something at least as important
+            # Playing on a channel cuts off what it was playing: a repeat of this effect, or a lesser one
+            channel.play(sound)
+            self._playing[name] = channel
+
+    def _preemptible(self, priority):
+        """Returns the channel playing the least important effect below priority, or None."""
+        lowest = None
+        for name, channel in self._playing.items():
+            other = SOUND_EFFECTS[name][1]
+            if other < priority and channel.get_sound() is self._sounds.get(SOUND_EFFECTS[name][0]):
+                if lowest is None or other < lowest[0]:
+                    lowest = (other, channel)
+        return lowest[1] if lowest is not None else None
+
+    def play_music(self):
+        """Loops the menu music, now or as soon as it has loaded."""
+        with self._lock:
+            self._music_wanted = True
+            if self.enabled and self._music_loaded:
+                self.pygame.mixer.music.play(loops=-1)
+
+    def stop_music(self):
+        with self._lock:
+            self._music_wanted = False
+            if self.enabled and self._music_loaded:
+                self.pygame.mixer.music.stop()
+
+    def shutdown(self):
+        """Stops the worker and shuts pygame down if it was started."""
+        self._worker.shutdown(wait=False)
+        if self.pygame is not None:
+            self.pygame.quit()
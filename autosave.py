@@ -0,0 +1,169 @@
+# Autosave journal: a snapshot followed by one small fixed-size record per choice
+import os
+import zlib
+import struct
+from game_state import GameState
+from save_store import atomic_write
+
+MAGIC = b"CYAJ"
+VERSION = 1
+# Records appended before the journal is compacted back into a single snapshot
+COMPACT_EVERY = 512
+
+# magic, version, story key, scene, chapter start, item/companion mask lengths
+_SNAPSHOT = struct.Struct("<4sBxxxIIIHH")
+_CRC = struct.Struct("<I")
+# scene, chapter start, choice index, reserved, item delta, companion delta, CRC32 of the rest
+_RECORD = struct.Struct("<IIHHQQI")
+_RECORD_BODY = _RECORD.size - _CRC.size
+_MAX_DELTA = 1 << 64
+
+NO_CHOICE = 0xFFFF # The scene was entered some other way, e.g. "Try Again"
+
+
+def story_key(story):
+    """Identifies a story's scene numbering so a journal is never replayed against another version."""
+    return story.fingerprint
+
+
+def _mask_bytes(mask):
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def encode_snapshot(key, state):
+    """Encodes the full state that starts a journal."""
+    items, companions = _mask_bytes(state.items), _mask_bytes(state.companions)
+    body = _SNAPSHOT.pack(MAGIC, VERSION, key, state.scene, state.chapter_start,
+                          len(items), len(companions)) + items + companions
+    return body + _CRC.pack(zlib.crc32(body))
+
+
+def encode_record(previous, state, choice=NO_CHOICE):
+    """Encodes one step as the new scene plus the item/companion bits that changed.
+
+    Returns None if the change doesn't fit in a record and needs a snapshot instead.
+    """
+    item_delta = previous.items ^ state.items
+    companion_delta = previous.companions ^ state.companions
+    if item_delta >= _MAX_DELTA or companion_delta >= _MAX_DELTA:
+        return None
+    body = _RECORD.pack(state.scene, state.chapter_start, choice, 0, item_delta, companion_delta, 0)[:_RECORD_BODY]
+    return body + _CRC.pack(zlib.crc32(body))
+
+
+def replay(data, key):
+    """Rebuilds the latest state from journal bytes.
+
+    Returns (state, records, valid length), or None if the journal is unusable.
+    A record torn by a crash, and anything after it, is ignored.
+    """
+    if len(data) < _SNAPSHOT.size:
+        return None
+    magic, version, journal_key, scene, chapter_start, item_len, companion_len = _SNAPSHOT.unpack_from(data)
+    if magic != MAGIC or version != VERSION or journal_key != key:
+        return None
+    end = _SNAPSHOT.size + item_len + companion_len
+    if len(data) < end + _CRC.size or zlib.crc32(data[:end]) != _CRC.unpack_from(data, end)[0]:
+        return None
+    items = int.from_bytes(data[_SNAPSHOT.size:_SNAPSHOT.size + item_len], "little")
+    companions = int.from_bytes(data[_SNAPSHOT.size + item_len:end], "little")
+
+    offset = start = end + _CRC.size
+    usable = start + (len(data) - start) // _RECORD.size * _RECORD.size
+    crc32 = zlib.crc32
+    view = memoryview(data)
+    for record in _RECORD.iter_unpack(view[start:usable]):
+        if crc32(view[offset:offset + _RECORD_BODY]) != record[6]:
+            break
+        scene, chapter_start, _, _, item_delta, companion_delta, _ = record
+        items ^= item_delta
+        companions ^= companion_delta
+        offset += _RECORD.size
+    state = GameState(scene, chapter_start, items, companions)
+    return state, (offset - start) // _RECORD.size, offset
+
+
+class AutosaveJournal:
+    """Keeps the game's progress on disk as it happens.
+
+    Each choice appends a 32-byte record and fsyncs it, so a crash or power
+    cut loses at most the choice being made. Every COMPACT_EVERY records the
+    journal is rewritten as a single snapshot, keeping replay short.
+    """
+
+    def __init__(self, path, story):
+        self.path = path
+        self.key = story_key(story)
+        self._file = None
+        self._state = None
+        self._records = 0
+
+    @property
+    def state(self):
+        """The last GameState written to the journal, or None."""
+        return self._state
+
+    def recover(self):
+        """Returns the last journaled GameState, or None if there's nothing to resume."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        result = replay(data, self.key)
+        if result is None:
+            print(f"Warning: Ignoring unreadable autosave journal at {self.path}")
+            return None
+        state, self._records, valid = result
+        self._close()
+        if valid < len(data):
+            # Cut off the torn record so new ones follow straight on from the last good one
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid)
+        self._state = state
+        return state
+
+    def start(self, state):
+        """Begins a fresh journal from state, e.g. for a new or loaded game."""
+        self._close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        atomic_write(self.path, encode_snapshot(self.key, state))
+        self._state = state
+        self._records = 0
+
+    def record(self, state, choice=NO_CHOICE):
+        """Appends the step from the previous state to state."""
+        if self._state is None:
+            self.start(state)
+            return
+        if state == self._state:
+            return
+        data = encode_record(self._state, state, choice)
+        if data is None or self._records >= COMPACT_EVERY:
+            self.start(state)
+            return
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._state = state
+        self._records += 1
+
+    def clear(self):
+        """Forgets the journal, e.g. once the story has been won."""
+        self._close()
+        self._state = None
+        self._records = 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._close()
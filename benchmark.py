@@ -0,0 +1,254 @@
+# Benchmarks for the game's hot paths, with a stored baseline to catch regressions
+#
+# Usage: python benchmark.py [--runs N] [--out results.json] [--baseline FILE]
+#                            [--save-baseline] [--tolerance 0.25] [--no-tk]
+#
+# Everything runs against generated art in a throwaway home folder, and
+# downloads go to a local HTTP server, so nothing on the Desktop is touched.
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+import statistics
+from asset_server import start_asset_server
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+WINDOW_SIZES = ((640, 480), (800, 600), (1024, 768), (1200, 900))
+ART_SIZE = (800, 600)
+DOWNLOAD_BYTES = 8 * 1024 * 1024
+
+
+def summarize(times):
+    """Returns the timing summary stored for one benchmark."""
+    ms = [t * 1000 for t in times]
+    return {"runs": len(ms), "min_ms": min(ms), "median_ms": statistics.median(ms),
+            "mean_ms": statistics.fmean(ms), "max_ms": max(ms)}
+
+
+def measure(fn, runs, setup=None, warmup=1):
+    """Times fn over runs calls, running setup (untimed) before each one."""
+    times = []
+    for i in range(warmup + runs):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        if i >= warmup:
+            times.append(time.perf_counter() - started)
+    return summarize(times)
+
+
+def make_art(path, size=ART_SIZE, seed=0):
+    """Writes a noisy PNG, which decodes at about the cost of real scene art."""
+    from PIL import Image
+    noise = [Image.effect_noise(size, 40 + 10 * band + seed % 7) for band in range(3)]
+    Image.merge("RGB", noise).save(path)
+
+
+# --- Benchmarks that don't need a display ---
+
+def bench_images(workdir, runs):
+    from image_cache import ImageCache, decode_image
+    path = os.path.join(workdir, "art.png")
+    make_art(path)
+    results = {"image_decode": measure(lambda: decode_image(path), runs)}
+    cache = ImageCache()
+    original = decode_image(path)
+    for size in WINDOW_SIZES:
+        results[f"resize_{size[0]}x{size[1]}"] = measure(lambda: cache.resized(path, original, size), runs)
+    return results
+
+
+def bench_saves(workdir, runs):
+    from save_store import SaveStore
+    store = SaveStore(os.path.join(workdir, "saves"))
+    state = {"scene": "chapter_five_step_3", "chapter_start": "chapter_five_start",
+             "inventory": ["Sturdy Shield", "Ancient Sword"], "companions": ["Elara the Healer"]}
+
+    def round_trip():
+        store.save(1, state)
+        store.load(1)
+    return {"save_load_round_trip": measure(round_trip, runs)}
+
+
+def bench_download(workdir, runs):
+    from assets import Downloader
+    server = start_asset_server(os.urandom(DOWNLOAD_BYTES))
+    url = f"http://127.0.0.1:{server.server_port}/asset.bin"
+    path = os.path.join(workdir, "download", "asset.bin")
+    downloader = Downloader()
+
+    def remove():
+        if os.path.exists(path):
+            os.remove(path)
+    try:
+        # The downloader reports every file it fetches; keep that out of the results table
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure(lambda: downloader.fetch(url, path), runs, setup=remove)
+    finally:
+        server.shutdown()
+        server.server_close()
+    result["throughput_mb_s"] = DOWNLOAD_BYTES / 2**20 / (result["median_ms"] / 1000)
+    return {"asset_download": result}
+
+
+def bench_revalidate(workdir, runs):
+    """Checks an unchanged asset for updates: one conditional GET answered with 304."""
+    from assets import Downloader
+    server = start_asset_server(os.urandom(DOWNLOAD_BYTES))
+    entry = {"kind": "image", "url": f"http://127.0.0.1:{server.server_port}/art.png",
+             "path": os.path.join(workdir, "revalidate", "art.png")}
+    downloader = Downloader(revalidate_after={"image": 0})
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloader.fetch(entry["url"], entry["path"])
+            result = measure(lambda: downloader.revalidate(entry), runs)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {"asset_revalidate_304": result}
+
+
+# --- Benchmarks that drive the real Tk game ---
+
+def bench_tk(workdir, runs):
+    """Runs the game in a throwaway home folder. Returns {} if there's no display."""
+    import tkinter as tk
+    try:
+        tk.Tk().destroy()
+    except tk.TclError as e:
+        print(f"Skipping Tk benchmarks, no display available: {e}")
+        return {}
+
+    os.environ["HOME"] = workdir
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import Chooseyourownadventure as game_module
+    from assets import MENU_IMAGE_FILE
+    from scene_graph import load_story
+
+    image_dir = os.path.join(workdir, "Desktop", "images")
+    os.makedirs(image_dir, exist_ok=True)
+    story = load_story()
+    for seed, image_file in enumerate(dict.fromkeys([MENU_IMAGE_FILE] + list(story.images))):
+        make_art(os.path.join(image_dir, image_file), seed=seed)
+
+    # Sounds would be fetched from the internet; the benchmarks run silent and offline
+    game_module.AdventureGame.fetch_sound = lambda self, sound_file: None
+    game_module.AdventureGame.revalidate_assets = lambda self: None
+    game = game_module.AdventureGame()
+    results = {}
+    try:
+        game.geometry("800x600")
+        game.start_game()
+        game.update()
+        rng = random.Random(0)
+
+        def next_scene():
+            engine = game.engine
+            if engine.done:
+                return engine.chapter_start
+            return rng.choice(engine.targets)
+
+        def transition():
+            game.play_scene(next_scene())
+            game.update_idletasks()
+        # Let the prefetcher run between scenes, as it does while the player reads
+        results["scene_transition"] = measure(transition, runs, setup=game.update)
+
+        for size in WINDOW_SIZES:
+            game.geometry(f"{size[0]}x{size[1]}")
+            game.update()
+            results[f"draw_background_{size[0]}x{size[1]}"] = measure(
+                game.draw_background, runs, setup=game.image_cache.photos.clear)
+
+        # The standard sizes again, with the art converted for Tk by native_art.py
+        from native_art import convert_art, NATIVE_DIR
+        from atlas import STANDARD_SIZES
+        convert_art([game.original_path], os.path.join(image_dir, NATIVE_DIR))
+        for size in STANDARD_SIZES:
+            game.geometry(f"{size[0]}x{size[1]}")
+            game.update()
+            results[f"draw_background_native_{size[0]}x{size[1]}"] = measure(
+                game.draw_background, runs, setup=game.image_cache.photos.clear)
+    finally:
+        game.quit()
+        game.destroy()
+    return results
+
+
+# --- Baseline comparison ---
+
+def compare(results, baseline, tolerance):
+    """Prints each benchmark against the baseline. Returns the names that got slower than allowed."""
+    regressions = []
+    print(f"{'benchmark':32} {'median ms':>10} {'baseline':>10} {'change':>8}")
+    for name, result in sorted(results["benchmarks"].items()):
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            print(f"{name:32} {result['median_ms']:10.2f} {'-':>10} {'new':>8}")
+            continue
+        ratio = result["median_ms"] / base["median_ms"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:32} {result['median_ms']:10.2f} {base['median_ms']:10.2f} {ratio - 1:+8.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scene transitions, resizes, decoding, saves and downloads.")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per benchmark (default 20)")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown of a median before it counts as a regression (default 0.25)")
+    parser.add_argument("--no-tk", action="store_true", help="skip the benchmarks that need a display")
+    args = parser.parse_args(argv)
+
+    from PIL import __version__ as pillow_version
+    results = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "pillow": pillow_version, "runs": args.runs},
+        "benchmarks": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="cyoa-bench-")
+    try:
+        for bench in (bench_images, bench_saves, bench_download, bench_revalidate):
+            results["benchmarks"].update(bench(workdir, args.runs))
+        if not args.no_tk:
+            results["benchmarks"].update(bench_tk(workdir, args.runs))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    else:
+        compare(results, {}, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
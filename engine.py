@@ -0,0 +1,99 @@
+# Headless story engine: the game logic without widgets, sound or images
+from scene_graph import SCENE, WIN, LOSE
+from game_state import GameState
+
+# Builds a GameState from a ready-made tuple without namedtuple's argument handling
+_new_state = tuple.__new__
+
+
+class StoryEngine:
+    """Tracks a player's way through a SceneGraph.
+
+    The Tk game drives one of these and only adds presentation on top, so
+    simulations and tools run exactly the same story logic as the game.
+    The whole position lives in self.state, an immutable GameState, so
+    snapshot() is free and states can be used as dict keys.
+    """
+
+    def __init__(self, story):
+        self.story = story
+        self.reset()
+
+    def reset(self):
+        """Starts a new game from the first scene with nothing in hand."""
+        self.state = GameState(self.story.start, self.story.start, 0, 0)
+        self.enter(self.story.start)
+
+    def restore(self, state):
+        """Continues from a state taken with snapshot() (or built by a save loader)."""
+        self.state = state
+        self._update_choices()
+
+    def snapshot(self):
+        return self.state
+
+    def enter(self, scene):
+        """Moves to a scene, applying its effects and working out its choices."""
+        story = self.story
+        _, chapter_start, items, companions = self.state
+        if story.chapter_start[scene]:
+            chapter_start = scene
+        if story.effects[scene]:
+            items, companions = story.apply_effects(scene, items, companions)
+        self.state = _new_state(GameState, (scene, chapter_start, items, companions))
+        self._update_choices()
+
+    def _update_choices(self):
+        scene, _, items, companions = self.state
+        if self.story.ends[scene] == SCENE:
+            self.choices = self.story.choices(scene, items, companions)
+        else:
+            self.choices = {}
+        self.targets = tuple(self.choices.values())
+
+    @property
+    def scene(self):
+        return self.state.scene
+
+    @property
+    def chapter_start(self):
+        return self.state.chapter_start
+
+    @property
+    def inventory(self):
+        """Names of the items held, in the order the story introduces them."""
+        return self.story.items.names_of(self.state.items)
+
+    @property
+    def companions(self):
+        """Names of the companions in the party, in the order the story introduces them."""
+        return self.story.companions.names_of(self.state.companions)
+
+    def state_from_names(self, scene, chapter_start, inventory, companions):
+        """Builds a GameState from scene indexes and item/companion names, e.g. from a save file."""
+        return GameState(scene, chapter_start, self.story.items.mask(inventory),
+                         self.story.companions.mask(companions))
+
+    @property
+    def done(self):
+        return self.story.ends[self.state.scene] != SCENE
+
+    @property
+    def won(self):
+        return self.story.ends[self.state.scene] == WIN
+
+    @property
+    def lost(self):
+        return self.story.ends[self.state.scene] == LOSE
+
+    def step(self, choice_index):
+        """Takes the choice at choice_index in the current scene and returns the new scene."""
+        if self.done:
+            raise ValueError("The story has ended; call retry() or reset()")
+        self.enter(self.targets[choice_index])
+        return self.state.scene
+
+    def retry(self):
+        """Restarts the current chapter, keeping items and companions, like "Try Again"."""
+        self.enter(self.state.chapter_start)
+        return self.state.scene
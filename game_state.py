@@ -0,0 +1,59 @@
+# Compact, hashable game state: items and companions as bit flags
+import sys
+from collections import namedtuple
+
+
+class Registry:
+    """Interns names (items or companions) and gives each one a bit flag."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.bits = {}
+        for name in names:
+            self.bit(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def bit(self, name):
+        """Returns the flag for name, registering it the first time it's seen."""
+        flag = self.bits.get(name)
+        if flag is None:
+            flag = 1 << len(self.names)
+            name = sys.intern(name)
+            self.names.append(name)
+            self.bits[name] = flag
+        return flag
+
+    def mask(self, names):
+        """Returns the flags for a collection of names OR-ed together."""
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+        return mask
+
+    def names_of(self, mask):
+        """Returns the names whose flags are set in mask, in registration order."""
+        found = []
+        i = 0
+        while mask:
+            if mask & 1:
+                found.append(self.names[i])
+            mask >>= 1
+            i += 1
+        return found
+
+
+def count_flags(mask):
+    """Returns how many flags are set in mask."""
+    return bin(mask).count("1")
+
+
+class GameState(namedtuple("GameState", "scene chapter_start items companions")):
+    """Where a player is: the scene, the chapter to restart from, and item/companion bit masks.
+
+    It's an immutable tuple of four small ints, so it hashes and compares by
+    value and a snapshot is just a reference to it. Updates build a new state
+    with _replace().
+    """
+    __slots__ = ()
@@ -0,0 +1,204 @@
+# Caches of decoded scene images and resized PhotoImages
+import tkinter as tk
+from collections import OrderedDict
+from PIL import Image, ImageTk
+from instrumentation import PROFILER
+
+try:
+    # For modern Pillow versions (>= 9.1.0)
+    from PIL.Image import Resampling
+    LANCZOS = Resampling.LANCZOS
+    NEAREST = Resampling.NEAREST
+except ImportError:
+    # For older Pillow versions
+    LANCZOS = Image.LANCZOS
+    NEAREST = Image.NEAREST
+
+
+class LRUCache:
+    """A least-recently-used cache bounded by the total byte size of its values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (value, size in bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        """Returns the cached keys, least recently used first, without marking any of them used."""
+        return list(self._entries)
+
+    def get(self, key):
+        """Returns the cached value for key (marking it recently used), or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size):
+        """Stores a value, evicting the least recently used entries to stay within budget."""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old[1]
+        if size > self.max_bytes:
+            return # Too big to ever fit; don't flush everything else for it
+        self._entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def discard(self, key):
+        """Removes a key if present."""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        """Returns a dict of hit/miss counters and current usage."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                "bytes": self.total_bytes, "max_bytes": self.max_bytes}
+
+
+def image_size_bytes(img):
+    """Estimates the memory held by a decoded image (one byte per band per pixel)."""
+    return img.width * img.height * len(img.getbands())
+
+
+def photo_size_bytes(size):
+    """Estimates the memory of a PhotoImage; Tk keeps its own RGBA copy of the pixels."""
+    return size[0] * size[1] * 4
+
+
+def native_photo(data):
+    """Makes a PhotoImage from PPM bytes; Tk parses them itself, without PIL."""
+    with PROFILER.phase("PhotoImage (PPM)"):
+        return tk.PhotoImage(data=data, format="PPM")
+
+
+def decode_image(path):
+    """Opens and fully decodes an image, releasing the file handle. Safe to call off the Tk thread."""
+    img = Image.open(path)
+    img.load()
+    return img
+
+
+class ImageCache:
+    """Decoded originals keyed by file, and resized PhotoImages keyed by (file, size).
+
+    With a TextureAtlas (see atlas.py), images it holds are mapped from the
+    atlas instead of being decoded, and sizes it was built for skip the resize.
+    With a PyramidCache (see pyramid.py), other sizes are resampled from the
+    nearest mip level rather than from the full-size original. With NativeArt
+    (see native_art.py), standard window sizes are loaded by Tk from PPM
+    files and PIL isn't involved at all.
+    """
+
+    def __init__(self, original_budget=64 * 1024 * 1024, photo_budget=48 * 1024 * 1024, atlas=None, pyramid=None,
+                 native=None):
+        self.originals = LRUCache(original_budget)
+        self.photos = LRUCache(photo_budget)
+        self.atlas = atlas
+        self.pyramid = pyramid
+        self.native = native
+
+    def decode(self, path):
+        """Returns the image at path from the atlas, or decodes it. Safe to call off the Tk thread."""
+        if self.atlas is not None:
+            img = self.atlas.original(path)
+            if img is not None:
+                return img
+        with PROFILER.phase("decode image"):
+            return decode_image(path)
+
+    def resized(self, path, original, size):
+        """Returns original scaled to size, straight from the atlas if it has that size. Thread-safe."""
+        if self.atlas is not None:
+            img = self.atlas.scaled(path, size)
+            if img is not None:
+                return img
+        source = self._source(path, original, size)
+        with PROFILER.phase("LANCZOS resize"):
+            return source.resize(size, LANCZOS)
+
+    def _source(self, path, original, size):
+        """Returns the smallest version of original that still covers size."""
+        if self.pyramid is None:
+            return original
+        return self.pyramid.source_for(path, original, size)
+
+    def native_data(self, path, size):
+        """Returns PPM bytes of path at size for native_photo(), or None. Thread-safe."""
+        if self.native is None:
+            return None
+        return self.native.data(path, size)
+
+    def prepare(self, path):
+        """Makes sure the image at path can be drawn. Raises FileNotFoundError like Image.open.
+
+        Art that's already cached, or has native copies, is left alone, since
+        drawing it at a standard size never decodes it; anything else is
+        decoded now.
+        """
+        if path in self.originals or any(key[0] == path for key in self.photos.keys()):
+            return
+        if self.native is None or not self.native.has(path):
+            self.original(path)
+
+    def original(self, path):
+        """Returns the fully decoded image at path. Raises FileNotFoundError like Image.open."""
+        img = self.originals.get(path)
+        if img is None:
+            img = self.decode(path)
+            self.put_original(path, img)
+        return img
+
+    def put_original(self, path, img):
+        """Stores an already decoded image, e.g. one decoded by the prefetcher."""
+        self.originals.put(path, img, image_size_bytes(img))
+
+    def photo(self, path, size):
+        """Returns a PhotoImage of the image at path, LANCZOS-resized to size (width, height)."""
+        key = (path, size)
+        photo = self.photos.get(key)
+        if photo is None:
+            data = self.native_data(path, size)
+            if data is not None:
+                photo = native_photo(data)
+            else:
+                resized = self.resized(path, self.original(path), size)
+                with PROFILER.phase("PhotoImage"):
+                    photo = ImageTk.PhotoImage(resized)
+            self.put_photo(path, size, photo)
+        return photo
+
+    def put_photo(self, path, size, photo):
+        """Stores a full-quality PhotoImage of path at size."""
+        self.photos.put((path, size), photo, photo_size_bytes(size))
+
+    def has_photo(self, path, size):
+        """Returns True if a full-quality PhotoImage of path at size is already cached."""
+        return (path, size) in self.photos
+
+    def preview(self, path, size):
+        """Returns a quick, uncached NEAREST PhotoImage used while the window is being dragged."""
+        source = self._source(path, self.original(path), size)
+        with PROFILER.phase("preview resize"):
+            return ImageTk.PhotoImage(source.resize(size, NEAREST))
+
+    def stats(self):
+        return {"originals": self.originals.stats(), "photos": self.photos.stats()}
@@ -0,0 +1,105 @@
+# Opt-in timing of the game's hot paths, for tracking down stutters
+import os
+import json
+import time
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Samples kept in the ring buffer; older ones are dropped as new ones arrive
+SAMPLE_CAPACITY = 4096
+
+_NO_PHASE = nullcontext()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Profiler:
+    """Times named phases into a ring buffer of recent samples.
+
+    Off by default: until enable() is called phase() hands back a shared
+    no-op context, so the timers can stay in the hot paths for free.
+    Samples can come from any thread.
+    """
+
+    def __init__(self, capacity=SAMPLE_CAPACITY):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.samples = deque(maxlen=capacity) # (name, thread id, thread name, start, duration) in seconds
+
+    def enable(self):
+        self.enabled = True
+
+    def phase(self, name):
+        """Context manager that times its body as one sample of name."""
+        if not self.enabled:
+            return _NO_PHASE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def timed(self, name):
+        """Decorator that times every call of a function as a sample of name."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timed(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, start, end):
+        """Adds a sample measured elsewhere, e.g. across several Tk callbacks."""
+        if self.enabled:
+            thread = threading.current_thread()
+            self.samples.append((name, thread.ident, thread.name, start, end - start))
+
+    def stats(self):
+        """Returns {name: {"count", "p50_ms", "p95_ms", "p99_ms", "max_ms"}} over the buffered samples."""
+        durations = {}
+        for name, _, _, _, duration in list(self.samples):
+            durations.setdefault(name, []).append(duration * 1000)
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stats[name] = {"count": len(values), "p50_ms": percentile(values, 0.50),
+                           "p95_ms": percentile(values, 0.95), "p99_ms": percentile(values, 0.99),
+                           "max_ms": values[-1]}
+        return stats
+
+    def report(self):
+        """Formats stats() as a small fixed-width table."""
+        lines = [f"{'phase':18} {'n':>5} {'p50':>7} {'p95':>7} {'p99':>7}"]
+        for name, s in sorted(self.stats().items()):
+            lines.append(f"{name[:18]:18} {s['count']:5} {s['p50_ms']:7.1f} {s['p95_ms']:7.1f} {s['p99_ms']:7.1f}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """Writes the buffered samples as a Chrome trace (open in chrome://tracing or Perfetto)."""
+        pid = os.getpid()
+        events, threads = [], {}
+        for name, tid, thread_name, start, duration in list(self.samples):
+            threads[tid] = thread_name
+            events.append({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                           "ts": (start - self.started) * 1e6, "dur": duration * 1e6})
+        for tid, thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# Shared by every module, so timers need no plumbing; see --profile in the game
+PROFILER = Profiler()
@@ -0,0 +1,96 @@
+# Load test for server.py: many simulated players making random choices at once
+#
+# Usage: python loadtest.py [--host 127.0.0.1] [--port 8765] [--clients 1000] [--steps 50] [--seed 0]
+#        python loadtest.py --local ...   (starts a server in-process first)
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from instrumentation import percentile
+
+
+async def play(host, port, steps, rng, latencies, errors):
+    """One simulated player: opens a session and makes steps random choices."""
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def send(request):
+        started = time.perf_counter()
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - started)
+        if "error" in reply:
+            errors.append(reply["error"])
+        return reply
+
+    try:
+        reply = await send({"op": "new"})
+        for _ in range(steps):
+            if reply.get("end") == "win":
+                reply = await send({"op": "new"})
+            elif reply.get("end") == "lose":
+                reply = await send({"op": "retry"})
+            else:
+                reply = await send({"op": "choose", "index": rng.randrange(len(reply["choices"]))})
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run(host, port, clients, steps, seed):
+    rng = random.Random(seed)
+    latencies, errors = [], []
+    started = time.perf_counter()
+    results = await asyncio.gather(*(play(host, port, steps, random.Random(rng.random()), latencies, errors)
+                                     for _ in range(clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failed = [result for result in results if isinstance(result, Exception)]
+
+    latencies.sort()
+    print("="*60)
+    print(f"{clients} clients x {steps} steps in {elapsed:.2f}s")
+    print(f"Requests: {len(latencies)} ({len(latencies) / elapsed:,.0f}/s), errors: {len(errors)}, failed clients: {len(failed)}")
+    if latencies:
+        print("Latency ms: " + ", ".join(f"p{int(p * 100)} {percentile(latencies, p) * 1000:.2f}"
+                                         for p in (0.50, 0.95, 0.99)) + f", max {latencies[-1] * 1000:.2f}")
+    if failed:
+        print(f"First failure: {failed[0]!r}")
+    print("="*60)
+    return 1 if failed or errors else 0
+
+
+async def run_local(args):
+    """Starts a server on a free local port, load-tests it, then stops it."""
+    from server import GameServer
+    from scene_graph import load_story
+    with tempfile.TemporaryDirectory(prefix="cyoa-sessions-") as sessions_dir:
+        game_server = GameServer(load_story(), sessions_dir)
+        address = asyncio.get_running_loop().create_future()
+        serving = asyncio.create_task(game_server.serve(args.host, 0, ready=address.set_result))
+        host, port = await address
+        try:
+            return await run(host, port, args.clients, args.steps, args.seed)
+        finally:
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the multi-session game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=1000, help="concurrent players (default 1000)")
+    parser.add_argument("--steps", type=int, default=50, help="choices each player makes (default 50)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--local", action="store_true", help="start a server in this process to test against")
+    args = parser.parse_args(argv)
+    if args.local:
+        return asyncio.run(run_local(args))
+    return asyncio.run(run(args.host, args.port, args.clients, args.steps, args.seed))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
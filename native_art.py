@@ -0,0 +1,159 @@
+# Display-ready scene art that Tk loads itself, without going through PIL
+#
+# Usage: python native_art.py [--images DIR] [--story FILE]
+import os
+import sys
+import json
+import argparse
+from image_cache import LANCZOS, decode_image
+from atlas import STANDARD_SIZES, source_stamp
+from save_store import atomic_write
+
+NATIVE_DIR = "native"
+# Images left to PIL because they have transparency: {file name: source stamp}
+SKIPPED_FILE = "skipped.json"
+# The PPM header comment recording which version of the PNG a file was made from
+_STAMP_PREFIX = b"# source "
+
+
+def _header(size, stamp):
+    return b"P6\n%s%d %d\n%d %d\n255\n" % (_STAMP_PREFIX, stamp[0], stamp[1], size[0], size[1])
+
+
+def _stamp_of(data):
+    """Returns the source stamp written in a converted file's header, or None."""
+    lines = data.split(b"\n", 2)
+    if len(lines) < 3 or lines[0] != b"P6" or not lines[1].startswith(_STAMP_PREFIX):
+        return None
+    try:
+        return [int(field) for field in lines[1][len(_STAMP_PREFIX):].split()]
+    except ValueError:
+        return None
+
+
+class NativeArt:
+    """Scene art pre-scaled to the standard window sizes as binary PPM files.
+
+    Tk parses PPM in C, so tk.PhotoImage(data=...) turns one of these into a
+    PhotoImage without decoding, resizing or converting anything in PIL.
+    Each file records the size and modification time of the PNG it was made
+    from and is ignored once that PNG changes. Whether an image has a copy
+    is worked out once per session, and not at all if the folder is missing.
+    """
+
+    def __init__(self, native_dir, sizes=STANDARD_SIZES):
+        self.native_dir = native_dir
+        self.sizes = {tuple(size) for size in sizes}
+        self.installed = os.path.isdir(native_dir)
+        self._has = {} # image path -> whether it has a current copy
+
+    def path_for(self, path, size):
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.native_dir, f"{name}.{size[0]}x{size[1]}.ppm")
+
+    def data(self, path, size):
+        """Returns the PPM bytes of path at size, or None if there's no current copy. Thread-safe."""
+        if not self.installed or size not in self.sizes:
+            return None
+        try:
+            with open(self.path_for(path, size), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        stamp = source_stamp(path)
+        # A missing source means only the converted copies are installed
+        if stamp is not None and _stamp_of(data) != stamp:
+            return None
+        return data
+
+    def has(self, path):
+        """Returns True if the image at path has a current copy at any standard size."""
+        if not self.installed:
+            return False
+        current = self._has.get(path)
+        if current is None:
+            current = self._check(path)
+            self._has[path] = current
+        return current
+
+    def _check(self, path):
+        stamp = source_stamp(path)
+        for size in self.sizes:
+            try:
+                with open(self.path_for(path, size), 'rb') as f:
+                    head = f.read(64)
+            except FileNotFoundError:
+                continue
+            if stamp is None or _stamp_of(head) == stamp:
+                return True
+        return False
+
+
+def convert_art(image_paths, native_dir, sizes=STANDARD_SIZES):
+    """Writes a PPM of every image at each of sizes, skipping ones that are current.
+
+    Images with transparency are left to PIL, since PPM can't hold it; they
+    are recorded in SKIPPED_FILE so later runs don't decode them again until
+    they change. Returns the number of files written.
+    """
+    os.makedirs(native_dir, exist_ok=True)
+    native = NativeArt(native_dir, sizes)
+    skipped_path = os.path.join(native_dir, SKIPPED_FILE)
+    skipped = _read_skipped(skipped_path)
+    recorded = dict(skipped)
+    written = 0
+    for path in image_paths:
+        name = os.path.basename(path)
+        stamp = source_stamp(path)
+        if skipped.get(name) == stamp:
+            continue
+        skipped.pop(name, None)
+        stale = [size for size in native.sizes if native.data(path, size) is None]
+        if not stale:
+            continue
+        img = decode_image(path)
+        if "A" in img.getbands() or "transparency" in img.info:
+            skipped[name] = stamp
+            continue
+        img = img.convert("RGB")
+        for size in stale:
+            resized = img if img.size == size else img.resize(size, LANCZOS)
+            atomic_write(native.path_for(path, size), _header(size, stamp) + resized.tobytes())
+            written += 1
+    if skipped != recorded:
+        atomic_write(skipped_path, json.dumps(skipped, indent=1, sort_keys=True).encode("utf-8"))
+    return written
+
+
+def _read_skipped(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            skipped = json.load(f)
+        return skipped if isinstance(skipped, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    from scene_graph import load_story
+    from assets import downloaded_images
+
+    parser = argparse.ArgumentParser(description="Convert the scene art to PPM files Tk can load without PIL.")
+    parser.add_argument("--images", default=os.path.join(os.path.expanduser("~"), "Desktop", "images"),
+                        help="folder holding the scene PNGs")
+    parser.add_argument("--out", help=f"folder to write to (default: <images>/{NATIVE_DIR})")
+    parser.add_argument("--story", help="story file listing the scene images")
+    args = parser.parse_args(argv)
+
+    story = load_story(args.story) if args.story else load_story()
+    present = downloaded_images(story, args.images)
+    if not present:
+        return 1
+    out_dir = args.out or os.path.join(args.images, NATIVE_DIR)
+    written = convert_art(present, out_dir)
+    print(f"Wrote {written} files to {out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
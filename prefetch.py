@@ -0,0 +1,96 @@
+# Background prefetching of the scene images one choice away
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from PIL import ImageTk
+from image_cache import photo_size_bytes, native_photo
+from instrumentation import PROFILER
+
+
+class Prefetcher:
+    """Decodes and pre-resizes upcoming scene images on worker threads.
+
+    Workers only touch PIL images. Finished work goes through a queue and is
+    turned into PhotoImages and stored in the ImageCache by drain(), which must
+    run on the Tk thread.
+    """
+
+    def __init__(self, cache, fetch, max_workers=2, budget_bytes=32 * 1024 * 1024):
+        self.cache = cache
+        self.fetch = fetch # image file name -> local path, downloading if needed
+        self.budget_bytes = budget_bytes
+        self.reserved_bytes = 0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.results = queue.Queue()
+        self.pending = {} # (image file, size) -> Future
+
+    def request(self, image_files, size, known_path):
+        """Prefetches image_files at size, cancelling any pending work not in this set.
+
+        known_path maps an image file name to its local path without downloading,
+        so images that are already cached can be skipped.
+        """
+        wanted = {(image_file, size) for image_file in image_files}
+
+        # Branches that are no longer one step away aren't worth finishing
+        for key in list(self.pending):
+            if key not in wanted:
+                self.pending.pop(key).cancel()
+                self.reserved_bytes -= photo_size_bytes(key[1])
+
+        for key in wanted:
+            image_file = key[0]
+            if key in self.pending or self.cache.has_photo(known_path(image_file), size):
+                continue
+            cost = photo_size_bytes(size)
+            if self.reserved_bytes + cost > self.budget_bytes:
+                break
+            original = self.cache.originals.get(known_path(image_file))
+            self.reserved_bytes += cost
+            self.pending[key] = self.executor.submit(self._work, key, original)
+
+    def _work(self, key, original):
+        """Worker thread: makes sure the image is on disk, then reads its PPM or decodes and resizes it."""
+        image_file, size = key
+        path = None
+        try:
+            path = self.fetch(image_file)
+            data = self.cache.native_data(path, size)
+            if data is not None:
+                self.results.put((key, path, None, data)) # Read here, parsed by Tk in drain()
+                return
+            if original is None:
+                original = self.cache.decode(path)
+            self.results.put((key, path, original, self.cache.resized(path, original, size)))
+        except Exception as e:
+            # A missing or broken image is reported when the scene is actually shown
+            print(f"Prefetch of {image_file} failed: {e}")
+            self.results.put((key, path, None, None))
+
+    def drain(self):
+        """Moves finished prefetches into the image cache. Returns True while work is pending."""
+        while True:
+            try:
+                key, path, original, resized = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.pending.pop(key, None) is None:
+                continue # Cancelled after it had already started
+            self.reserved_bytes -= photo_size_bytes(key[1])
+            if resized is None:
+                continue
+            if isinstance(resized, bytes):
+                photo = native_photo(resized)
+            else:
+                if path not in self.cache.originals:
+                    self.cache.put_original(path, original)
+                with PROFILER.phase("PhotoImage"):
+                    photo = ImageTk.PhotoImage(resized)
+            self.cache.put_photo(path, key[1], photo)
+        return bool(self.pending)
+
+    def shutdown(self):
+        """Stops the workers without waiting for queued work."""
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
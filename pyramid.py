@@ -0,0 +1,70 @@
+# Mip pyramids: each image pre-halved down to thumbnail size and cached on disk
+import os
+import threading
+from atlas import AtlasWriter, TextureAtlas, source_stamp
+
+PYRAMID_DIR = "mipmaps"
+# Halving stops once a level would be smaller than this on either side
+MIN_LEVEL_SIDE = 64
+
+
+def mip_levels(img):
+    """Returns [img, img/2, img/4, ...], each level box-filtered from the one above it."""
+    levels = [img]
+    while min(levels[-1].size) // 2 >= MIN_LEVEL_SIDE:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+
+def pick_level(sizes, size):
+    """Returns the smallest of sizes that still covers size in both directions, or None."""
+    covering = [s for s in sizes if s[0] >= size[0] and s[1] >= size[1]]
+    return min(covering, default=None)
+
+
+class PyramidCache:
+    """Builds each image's mip pyramid on first use and keeps it in cache_dir.
+
+    A pyramid is stored as a one-image atlas (see atlas.py), so it's mapped
+    rather than decoded on later runs, and it's rebuilt when its source PNG
+    changes. Resizing then starts from the nearest level at least as large
+    as the target, so its cost follows the window size, not the art size.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._pyramids = {} # image path -> TextureAtlas
+        self._lock = threading.Lock()
+
+    def _pyramid_path(self, path):
+        return os.path.join(self.cache_dir, os.path.basename(path) + ".mip")
+
+    def _pyramid(self, path, original):
+        """Returns the mapped pyramid for path, building it from original if needed."""
+        pyramid = self._pyramids.get(path)
+        if pyramid is not None and pyramid.sizes_of(path) is not None:
+            return pyramid
+        with self._lock:
+            pyramid_path = self._pyramid_path(path)
+            pyramid = TextureAtlas.open(pyramid_path)
+            if pyramid is None or pyramid.sizes_of(path) is None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                writer = AtlasWriter(pyramid_path)
+                # The full-size level is already in memory, so only the smaller ones are stored
+                writer.add(os.path.basename(path), source_stamp(path), mip_levels(original)[1:])
+                writer.close()
+                pyramid = TextureAtlas(pyramid_path)
+            self._pyramids[path] = pyramid
+            return pyramid
+
+    def source_for(self, path, original, size):
+        """Returns the level of original to resample from when scaling it to size. Thread-safe."""
+        if original.width < 2 * size[0] or original.height < 2 * size[1] or min(original.size) // 2 < MIN_LEVEL_SIDE:
+            return original # No smaller level would still cover size
+        try:
+            pyramid = self._pyramid(path, original)
+        except OSError as e:
+            print(f"Warning: Could not cache mip levels for {os.path.basename(path)}: {e}")
+            return original
+        level = pick_level(pyramid.sizes_of(path), size)
+        return pyramid.scaled(path, level) if level is not None else original
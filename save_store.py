@@ -0,0 +1,227 @@
+# Crash-safe save slots: compact checksummed files plus one cached index
+import os
+import re
+import json
+import time
+import zlib
+import struct
+
+MAGIC = b"CYOA"
+VERSION = 1
+INDEX_FILE = "index.json"
+
+# magic, format version, payload length, CRC32 of the payload
+_HEADER = struct.Struct("<4sBII")
+_SAVED_AT = struct.Struct("<d")
+_STR_LEN = struct.Struct("<H")
+_COUNT = struct.Struct("<B")
+
+_SLOT_FILE = re.compile(r"^slot_(\d+)\.sav$")
+_LEGACY_FILE = re.compile(r"^save_(\d+)\.json$")
+
+
+class SaveError(Exception):
+    """A save slot is missing, corrupted, or written by a newer version of the game."""
+
+
+def atomic_write(path, data):
+    """Writes data to path so that a crash leaves either the old or the new file, never half of one."""
+    directory = os.path.dirname(path) or "."
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # Make the rename itself durable (not supported on Windows, where it isn't needed)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _pack_str(text):
+    data = text.encode("utf-8")
+    return _STR_LEN.pack(len(data)) + data
+
+
+def _pack_names(names):
+    return _COUNT.pack(len(names)) + b"".join(_pack_str(name) for name in names)
+
+
+def encode_save(state):
+    """Encodes a save state dict into the versioned binary format."""
+    payload = b"".join([
+        _SAVED_AT.pack(state.get("saved_at", time.time())),
+        _pack_str(state["scene"]),
+        _pack_str(state["chapter_start"]),
+        _pack_names(state["inventory"]),
+        _pack_names(state["companions"]),
+    ])
+    return _HEADER.pack(MAGIC, VERSION, len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_save(data):
+    """Decodes and verifies a save file. Raises SaveError if it's damaged."""
+    if len(data) < _HEADER.size:
+        raise SaveError("Save file is truncated.")
+    magic, version, length, checksum = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SaveError("Not a save file.")
+    if version > VERSION:
+        raise SaveError("Save file was written by a newer version of the game.")
+    payload = data[_HEADER.size:_HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise SaveError("Save file is corrupted.")
+
+    offset = 0
+
+    def read(fmt):
+        nonlocal offset
+        value = fmt.unpack_from(payload, offset)[0]
+        offset += fmt.size
+        return value
+
+    def read_str():
+        nonlocal offset
+        size = read(_STR_LEN)
+        text = payload[offset:offset + size].decode("utf-8")
+        offset += size
+        return text
+
+    saved_at = read(_SAVED_AT)
+    scene = read_str()
+    chapter_start = read_str()
+    inventory = [read_str() for _ in range(read(_COUNT))]
+    companions = [read_str() for _ in range(read(_COUNT))]
+    return {"saved_at": saved_at, "scene": scene, "chapter_start": chapter_start,
+            "inventory": inventory, "companions": companions}
+
+
+def _decode_legacy(data):
+    """Reads the original save_<n>.json format."""
+    state = json.loads(data)
+    return {"saved_at": None, "scene": state["current_scene_method_name"],
+            "chapter_start": state["current_chapter_start_method_name"],
+            "inventory": state["inventory"], "companions": state["companions"]}
+
+
+def _valid_info(info):
+    """Checks that an index entry has the fields the slot menu reads."""
+    return (isinstance(info, dict) and isinstance(info.get("scene"), str)
+            and (info.get("saved_at") is None or isinstance(info["saved_at"], (int, float)))
+            and isinstance(info.get("legacy", False), bool))
+
+
+class SaveStore:
+    """Any number of save slots in one directory.
+
+    The slot list comes from an index file that's read once and kept in memory,
+    so opening the save menu doesn't touch each slot file. If the index is
+    missing or damaged it's rebuilt with a single directory scan.
+    """
+
+    def __init__(self, save_dir):
+        self.save_dir = save_dir
+        os.makedirs(save_dir, exist_ok=True)
+        self._index = None # slot number -> {"scene", "saved_at", "legacy"}
+
+    def slot_path(self, slot):
+        return os.path.join(self.save_dir, f"slot_{slot}.sav")
+
+    def _legacy_path(self, slot):
+        return os.path.join(self.save_dir, f"save_{slot}.json")
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self._read_index()
+        return self._index
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.save_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+                index = {int(slot): info for slot, info in json.load(f)["slots"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return self.rebuild_index()
+        # Valid JSON in the wrong shape is as damaged as a truncated file
+        if not all(_valid_info(info) for info in index.values()):
+            return self.rebuild_index()
+        return index
+
+    def rebuild_index(self):
+        """Rebuilds the index from the slot files actually on disk."""
+        index = {}
+        for name in sorted(os.listdir(self.save_dir)):
+            match = _SLOT_FILE.match(name) or _LEGACY_FILE.match(name)
+            if match is None:
+                continue
+            slot = int(match.group(1))
+            legacy = name.endswith(".json")
+            if legacy and slot in index:
+                continue # A slot file replaces the old JSON save in the same slot
+            try:
+                state = self._read_slot_file(os.path.join(self.save_dir, name), legacy)
+            except (OSError, SaveError):
+                continue
+            index[slot] = {"scene": state["scene"], "saved_at": state["saved_at"], "legacy": legacy}
+        self._index = index
+        self._write_index()
+        return index
+
+    def _write_index(self):
+        data = {"version": VERSION, "slots": {str(slot): info for slot, info in sorted(self._index.items())}}
+        atomic_write(os.path.join(self.save_dir, INDEX_FILE), json.dumps(data).encode("utf-8"))
+
+    def slots(self):
+        """Returns the numbers of all used slots, in order."""
+        return sorted(self.index)
+
+    def info(self, slot):
+        """Returns {"scene", "saved_at"} for a used slot, or None if it's empty."""
+        return self.index.get(slot)
+
+    def next_free_slot(self):
+        return max(self.index, default=0) + 1
+
+    def save(self, slot, state):
+        """Saves a state dict ("scene", "chapter_start", "inventory", "companions") to a slot."""
+        state = dict(state, saved_at=time.time())
+        atomic_write(self.slot_path(slot), encode_save(state))
+        self.index[slot] = {"scene": state["scene"], "saved_at": state["saved_at"], "legacy": False}
+        self._write_index()
+
+    def load(self, slot):
+        """Returns the state dict saved in a slot. Raises SaveError if it's empty or damaged."""
+        info = self.index.get(slot)
+        if info is None:
+            raise SaveError("Save file not found.")
+        path = self._legacy_path(slot) if info.get("legacy") else self.slot_path(slot)
+        try:
+            return self._read_slot_file(path, info.get("legacy"))
+        except FileNotFoundError:
+            # Removed behind our back; forget it
+            del self.index[slot]
+            self._write_index()
+            raise SaveError("Save file not found.") from None
+
+    def _read_slot_file(self, path, legacy):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if legacy:
+            try:
+                return _decode_legacy(data)
+            except (ValueError, KeyError) as e:
+                raise SaveError(f"Save file is corrupted: {e}") from None
+        return decode_save(data)
+
+    def delete(self, slot):
+        """Empties a slot."""
+        if self.index.pop(slot, None) is None:
+            return
+        for path in (self.slot_path(slot), self._legacy_path(slot)):
+            if os.path.exists(path):
+                os.remove(path)
+        self._write_index()
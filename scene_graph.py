@@ -0,0 +1,145 @@
+# Compiled scene graph for the adventure story
+import os
+import sys
+import json
+import zlib
+from game_state import Registry, count_flags
+
+STORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "story.json")
+
+# Scene kinds
+SCENE = 0
+WIN = 1
+LOSE = 2
+
+_END_KINDS = {None: SCENE, "win": WIN, "lose": LOSE}
+
+
+def fingerprint_of(names):
+    """Identifies a story's scene numbering, so state saved by index is never read against another version."""
+    return zlib.crc32("\n".join(names).encode("utf-8"))
+
+
+def compile_condition(cond, items, companions):
+    """Turns a condition from the story file into a predicate over (item mask, companion mask).
+
+    items and companions are the Registries that hand out the bit flags.
+    """
+    if "not" in cond:
+        inner = compile_condition(cond["not"], items, companions)
+        return lambda item_mask, companion_mask: not inner(item_mask, companion_mask)
+    if "item" in cond:
+        flag = items.bit(cond["item"])
+        return lambda item_mask, companion_mask: bool(item_mask & flag)
+    if "companion" in cond:
+        flag = companions.bit(cond["companion"])
+        return lambda item_mask, companion_mask: bool(companion_mask & flag)
+    if "companions_below" in cond:
+        limit = cond["companions_below"]
+        return lambda item_mask, companion_mask: count_flags(companion_mask) < limit
+    raise ValueError(f"Unknown story condition: {cond}")
+
+
+class SceneGraph:
+    """An index-addressed table of scenes compiled once from a story file.
+
+    Every per-scene attribute lives in a tuple indexed by scene number, and
+    choices point at other scenes by index, so moving between scenes is a
+    table lookup rather than a method call that rebuilds its own data.
+    Items and companions are bit flags handed out by the items and
+    companions Registries (see game_state.py).
+    """
+
+    def __init__(self, story):
+        self.title = story.get("title", "")
+        self.items = Registry()
+        self.companions = Registry()
+        scene_defs = story["scenes"]
+
+        self.names = tuple(sys.intern(name) for name in scene_defs)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.start = self._lookup(story["start"], "start")
+        self.fingerprint = fingerprint_of(self.names)
+
+        images, texts, ends, chapter_start, edges, effects = [], [], [], [], [], []
+        for name, scene in scene_defs.items():
+            images.append(sys.intern(scene["image"]))
+            texts.append(sys.intern(scene["text"]))
+            ends.append(_END_KINDS[scene.get("end")])
+            chapter_start.append(bool(scene.get("chapter_start")))
+            edges.append(tuple(self._compile_choice(name, choice) for choice in scene.get("choices", ())))
+            effects.append(tuple(self._compile_effect(name, effect) for effect in scene.get("effects", ())))
+
+        self.images = tuple(images)
+        self.texts = tuple(texts)
+        self.ends = tuple(ends)
+        self.chapter_start = tuple(chapter_start)
+        self.edges = tuple(edges)
+        self.effects = tuple(effects)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _lookup(self, name, where):
+        """Returns the index of a scene name, failing loudly on typos in the story file."""
+        try:
+            return self.index[name]
+        except KeyError:
+            raise ValueError(f"Story file refers to unknown scene '{name}' (in {where})") from None
+
+    def _compile_choice(self, scene_name, choice):
+        """Compiles one choice into (text, when, target, condition, else_target)."""
+        when = self._condition(choice.get("when"))
+        target = self._lookup(choice["to"], scene_name)
+        condition = self._condition(choice.get("if"))
+        else_target = self._lookup(choice["else"], scene_name) if condition else target
+        return (sys.intern(choice["text"]), when, target, condition, else_target)
+
+    def _condition(self, cond):
+        return compile_condition(cond, self.items, self.companions) if cond is not None else None
+
+    def _compile_effect(self, scene_name, effect):
+        """Compiles one effect into (item flag, companion flag, condition)."""
+        condition = self._condition(effect.get("if"))
+        if "add_item" in effect:
+            return (self.items.bit(effect["add_item"]), 0, condition)
+        if "add_companion" in effect:
+            return (0, self.companions.bit(effect["add_companion"]), condition)
+        raise ValueError(f"Unknown effect in scene '{scene_name}': {effect}")
+
+    def choices(self, scene, items, companions):
+        """Returns the {text: target scene index} choices available in a scene for the given masks."""
+        available = {}
+        for text, when, target, condition, else_target in self.edges[scene]:
+            if when is not None and not when(items, companions):
+                continue
+            if condition is not None and not condition(items, companions):
+                target = else_target
+            available[text] = target
+        return available
+
+    def apply_effects(self, scene, items, companions):
+        """Returns the (items, companions) masks after the scene's effects.
+
+        Effects set flags, so entering a scene twice doesn't grant anything twice.
+        """
+        for item_flag, companion_flag, condition in self.effects[scene]:
+            if condition is not None and not condition(items, companions):
+                continue
+            items |= item_flag
+            companions |= companion_flag
+        return items, companions
+
+
+def load_story(path=STORY_FILE):
+    """Loads and compiles a story file into a SceneGraph.
+
+    If `python story_bytecode.py` has built up-to-date bytecode for the file,
+    that's memory-mapped instead, which is much faster for big stories.
+    """
+    from story_bytecode import load_compiled # It builds on this module
+    story = load_compiled(path)
+    if story is not None:
+        return story
+    with open(path, 'r', encoding='utf-8') as f:
+        return SceneGraph(json.load(f))
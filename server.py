@@ -0,0 +1,293 @@
+# Multi-session game server: many players on one process, one shared story
+#
+# Usage: python server.py [--host 127.0.0.1] [--port 8765] [--sessions-dir DIR]
+#                         [--idle-timeout SECONDS] [--max-sessions N] [--story FILE]
+#
+# Protocol: one JSON object per line in each direction over a TCP socket.
+#   {"op": "new"}                      start a session; the connection follows it, and drops any it had
+#   {"op": "resume", "session": id}    pick up a session, even one evicted to disk (but not a won one)
+#   {"op": "look"}                     describe the current scene again
+#   {"op": "choose", "index": i}       take the i-th choice of the current scene
+#   {"op": "retry"}                    restart the chapter after losing
+# Every reply describes the scene ({"session", "scene", "text", "image",
+# "choices", "inventory", "companions", "end"}) or is {"error": message}.
+import os
+import re
+import sys
+import json
+import time
+import signal
+import asyncio
+import secrets
+import argparse
+from scene_graph import load_story, WIN, LOSE
+from engine import StoryEngine
+from autosave import encode_snapshot, replay, story_key
+from save_store import atomic_write
+
+# Longest request line accepted; a session can't make the server buffer more than this
+MAX_REQUEST_BYTES = 4096
+IDLE_TIMEOUT = 300
+EVICT_INTERVAL = 10
+MAX_SESSIONS = 100000
+# Pending connections the OS queues, so a crowd of players connecting at once isn't refused
+LISTEN_BACKLOG = 4096
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{16}$")
+_END_NAMES = {WIN: "win", LOSE: "lose"}
+
+
+class RequestError(Exception):
+    """A request the server can't carry out; reported back to the client."""
+
+
+class Session:
+    """One player's game: an id, an immutable GameState and when it was last used.
+
+    This is all a session holds, so its memory use is fixed no matter how
+    long it plays; the scenes themselves live once in the shared story.
+    """
+    __slots__ = ("id", "state", "last_seen")
+
+    def __init__(self, session_id, state):
+        self.id = session_id
+        self.state = state
+        self.last_seen = time.monotonic()
+
+
+class GameServer:
+    """Hosts sessions of one story over newline-delimited JSON.
+
+    Everything runs on the event loop, so one StoryEngine is shared by all
+    sessions: each request restores a session's state into it, steps, and
+    takes the new state back out. Sessions idle for idle_timeout seconds, or
+    the oldest beyond max_sessions, are written to sessions_dir and dropped
+    from memory; they're read back transparently when they're next used,
+    and the file is deleted then. Won games are dropped without being
+    written, and a connection starting a new game drops its old one, so
+    sessions_dir only holds games that can still be resumed.
+    """
+
+    def __init__(self, story, sessions_dir, idle_timeout=IDLE_TIMEOUT, max_sessions=MAX_SESSIONS):
+        self.story = story
+        self.engine = StoryEngine(story)
+        self.key = story_key(story)
+        self.sessions_dir = sessions_dir
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions = {} # session id -> Session, for sessions held in memory
+        self.connections = 0
+        os.makedirs(sessions_dir, exist_ok=True)
+
+    # --- Sessions ---
+
+    def _session_path(self, session_id):
+        return os.path.join(self.sessions_dir, f"{session_id}.session")
+
+    def _remove_session_file(self, session_id):
+        try:
+            os.remove(self._session_path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def end_session(self, session):
+        """Forgets a session for good, in memory and on disk."""
+        if self.sessions.get(session.id) is session:
+            del self.sessions[session.id]
+        self._remove_session_file(session.id)
+
+    def new_session(self):
+        session_id = secrets.token_hex(8)
+        self.engine.reset()
+        session = self.sessions[session_id] = Session(session_id, self.engine.snapshot())
+        return session
+
+    def session(self, session_id):
+        """Returns a session from memory, or reloads it from disk if it was evicted."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            if not isinstance(session_id, str) or not _SESSION_ID.match(session_id):
+                raise RequestError("unknown session")
+            try:
+                with open(self._session_path(session_id), 'rb') as f:
+                    result = replay(f.read(), self.key)
+            except FileNotFoundError:
+                result = None
+            if result is None:
+                raise RequestError("unknown session")
+            session = self.sessions[session_id] = Session(session_id, result[0])
+            # Memory holds the only copy from here on; it's written again if the session is evicted again
+            self._remove_session_file(session_id)
+        session.last_seen = time.monotonic()
+        return session
+
+    def _write_sessions(self, sessions):
+        """Worker thread: stores (id, state) pairs on disk; a state of None deletes the session's file."""
+        for session_id, state in sessions:
+            if state is None:
+                self._remove_session_file(session_id)
+            else:
+                atomic_write(self._session_path(session_id), encode_snapshot(self.key, state))
+
+    async def evict(self, everything=False):
+        """Moves idle sessions (and the oldest beyond max_sessions) to disk. Returns how many."""
+        if everything:
+            victims = list(self.sessions.values())
+        else:
+            cutoff = time.monotonic() - self.idle_timeout
+            by_age = sorted(self.sessions.values(), key=lambda session: session.last_seen)
+            overflow = len(by_age) - self.max_sessions
+            victims = [session for i, session in enumerate(by_age) if i < overflow or session.last_seen < cutoff]
+        if not victims:
+            return 0
+        seen = {session.id: session.last_seen for session in victims}
+        # Won games are over, so there's nothing to keep
+        ends = self.story.ends
+        await asyncio.to_thread(self._write_sessions, [(session.id, None if ends[session.state.scene] == WIN
+                                                        else session.state) for session in victims])
+        evicted = 0
+        for session in victims:
+            # A session used while it was being written stays in memory with its newer state
+            if self.sessions.get(session.id) is session and session.last_seen == seen[session.id]:
+                del self.sessions[session.id]
+                evicted += 1
+        return evicted
+
+    async def _evict_forever(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict()
+            except OSError as e:
+                print(f"Warning: Could not evict sessions to {self.sessions_dir}: {e}")
+
+    # --- Requests ---
+
+    def describe(self, session):
+        """Describes a session's current scene for the client."""
+        story, engine = self.story, self.engine
+        engine.restore(session.state)
+        scene = engine.scene
+        return {"session": session.id, "scene": story.names[scene], "text": story.texts[scene],
+                "image": story.images[scene], "choices": list(engine.choices),
+                "inventory": engine.inventory, "companions": engine.companions,
+                "end": _END_NAMES.get(story.ends[scene])}
+
+    def handle(self, request, session):
+        """Carries out one request. Returns (session, reply)."""
+        if not isinstance(request, dict):
+            raise RequestError("requests must be JSON objects")
+        op = request.get("op")
+        if op == "new":
+            if session is not None:
+                self.end_session(session)
+            session = self.new_session()
+        elif op == "resume":
+            session = self.session(request.get("session"))
+        elif session is None:
+            raise RequestError("start or resume a session first")
+        else:
+            session = self.session(session.id) # Reloads it if it was evicted meanwhile
+            engine = self.engine
+            if op == "choose":
+                engine.restore(session.state)
+                index = request.get("index")
+                if engine.done:
+                    raise RequestError("the story has ended; send retry")
+                if not isinstance(index, int) or not 0 <= index < len(engine.targets):
+                    raise RequestError("no such choice")
+                engine.step(index)
+                session.state = engine.snapshot()
+                if engine.won:
+                    # An evicted copy of the game in progress may still be on disk
+                    self._remove_session_file(session.id)
+            elif op == "retry":
+                engine.restore(session.state)
+                engine.retry()
+                session.state = engine.snapshot()
+            elif op != "look":
+                raise RequestError(f"unknown op {op!r}")
+        return session, self.describe(session)
+
+    async def serve_connection(self, reader, writer):
+        self.connections += 1
+        session = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'{"error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                try:
+                    session, reply = self.handle(json.loads(line), session)
+                except (ValueError, RequestError) as e:
+                    reply = {"error": str(e)}
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                # Waits for slow readers, so replies don't pile up in memory
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self, host, port, evict_interval=EVICT_INTERVAL, ready=None):
+        """Serves until cancelled, then writes every session to disk."""
+        server = await asyncio.start_server(self.serve_connection, host, port, limit=MAX_REQUEST_BYTES,
+                                            backlog=LISTEN_BACKLOG)
+        evictor = asyncio.create_task(self._evict_forever(evict_interval))
+        address = server.sockets[0].getsockname()
+        print(f"Serving {self.story.title or 'the story'} on {address[0]}:{address[1]}")
+        if ready is not None:
+            ready(address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+            saved = await self.evict(everything=True)
+            print(f"Saved {saved} sessions to {self.sessions_dir}")
+
+
+async def serve_until_stopped(game_server, host, port):
+    """Serves until Ctrl+C or SIGTERM, saving every session on the way out."""
+    serving = asyncio.create_task(game_server.serve(host, port))
+    loop = asyncio.get_running_loop()
+    for name in ("SIGINT", "SIGTERM"):
+        try:
+            loop.add_signal_handler(getattr(signal, name), serving.cancel)
+        except (AttributeError, NotImplementedError):
+            pass # Windows: Ctrl+C still arrives as KeyboardInterrupt
+    try:
+        await serving
+    except asyncio.CancelledError:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many concurrent players of the story.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sessions-dir", default=os.path.join(os.path.expanduser("~"), "Desktop", "adventure_sessions"),
+                        help="where idle sessions are kept")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help=f"seconds before an idle session is moved to disk (default {IDLE_TIMEOUT})")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS,
+                        help=f"sessions kept in memory before the oldest are moved to disk (default {MAX_SESSIONS})")
+    parser.add_argument("--story", help="story file to serve")
+    args = parser.parse_args(argv)
+
+    story = load_story(args.story) if args.story else load_story()
+    game_server = GameServer(story, args.sessions_dir, args.idle_timeout, args.max_sessions)
+    try:
+        asyncio.run(serve_until_stopped(game_server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
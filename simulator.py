@@ -0,0 +1,167 @@
+# Batch playthroughs of the story on the headless engine
+#
+# Usage: python simulator.py [-n PLAYTHROUGHS] [--processes N] [--seed S] [--script 0,2,1,...]
+#                            [--max-retries N]
+import os
+import time
+import random
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+from scene_graph import load_story, STORY_FILE
+from engine import StoryEngine
+
+# Playthroughs that wander in loops this long are counted as abandoned
+MAX_STEPS = 10000
+# Times a playthrough presses "Try Again" in one chapter before it gives up. Off by default:
+# random play needs hundreds of tries per chapter, which makes a game thousands of times slower
+MAX_RETRIES = 0
+
+_engine = None # One engine per worker process, set up by _init_worker
+
+
+def random_policy(rng):
+    """Picks uniformly among the available choices."""
+    def choose(engine, step):
+        return rng.randrange(len(engine.targets))
+    return choose
+
+
+def scripted_policy(script, rng):
+    """Follows a fixed list of choice indexes, then falls back to random choices."""
+    def choose(engine, step):
+        if step < len(script):
+            return script[step] % len(engine.targets)
+        return rng.randrange(len(engine.targets))
+    return choose
+
+
+def new_stats():
+    return {"playthroughs": 0, "wins": 0, "losses": 0, "abandoned": 0, "steps": 0, "retries": 0,
+            "fails": Counter(), "chapter_steps": Counter(), "chapter_visits": Counter()}
+
+
+def merge_stats(total, stats):
+    """Adds the counters of stats into total."""
+    for key, value in stats.items():
+        total[key] += value
+    return total
+
+
+def play(engine, choose, stats, max_steps=MAX_STEPS, max_retries=MAX_RETRIES):
+    """Plays one game from the start until it's won or given up, recording it in stats.
+
+    After a loss the chapter is restarted with engine.retry(), as "Try Again"
+    does, up to max_retries times per chapter; every loss counts towards its
+    fail scene.
+    """
+    engine.reset()
+    names, ends = engine.story.names, engine.story.ends
+    chapter_steps = Counter()
+    step = retries = chapter_retries = 0
+    chapter = None
+    while step < max_steps:
+        scene, chapter_start, _, _ = engine.state
+        if chapter_start != chapter:
+            chapter, chapter_retries = chapter_start, 0
+        if ends[scene]:
+            if not engine.lost:
+                break
+            stats["fails"][names[scene]] += 1
+            if chapter_retries == max_retries:
+                break
+            chapter_retries += 1
+            retries += 1
+            engine.retry()
+            continue
+        chapter_steps[chapter_start] += 1
+        engine.enter(engine.targets[choose(engine, step)])
+        step += 1
+
+    stats["playthroughs"] += 1
+    stats["steps"] += step
+    stats["retries"] += retries
+    if engine.won:
+        stats["wins"] += 1
+    elif engine.lost:
+        stats["losses"] += 1
+    else:
+        stats["abandoned"] += 1
+    for chapter, steps in chapter_steps.items():
+        stats["chapter_steps"][names[chapter]] += steps
+        stats["chapter_visits"][names[chapter]] += 1
+
+
+def _init_worker(story_path):
+    global _engine
+    _engine = StoryEngine(load_story(story_path))
+
+
+def _run_chunk(args):
+    """Worker: plays count games and returns their combined stats."""
+    count, seed, script, max_retries = args
+    rng = random.Random(seed)
+    choose = scripted_policy(script, rng) if script else random_policy(rng)
+    stats = new_stats()
+    for _ in range(count):
+        play(_engine, choose, stats, max_retries=max_retries)
+    return stats
+
+
+def run_batch(playthroughs, processes=None, seed=None, script=None, story_path=STORY_FILE, chunk_size=5000,
+              max_retries=MAX_RETRIES):
+    """Plays many games across a process pool and returns the merged stats."""
+    processes = processes or os.cpu_count() or 1
+    seeds = random.Random(seed)
+    chunks = []
+    remaining = playthroughs
+    while remaining > 0:
+        count = min(chunk_size, remaining)
+        chunks.append((count, seeds.getrandbits(64), script, max_retries))
+        remaining -= count
+
+    total = new_stats()
+    if processes == 1:
+        _init_worker(story_path)
+        for chunk in chunks:
+            merge_stats(total, _run_chunk(chunk))
+        return total
+    with Pool(processes, initializer=_init_worker, initargs=(story_path,)) as pool:
+        for stats in pool.imap_unordered(_run_chunk, chunks):
+            merge_stats(total, stats)
+    return total
+
+
+def print_report(stats, elapsed, top=10):
+    """Prints win rates, the most common fail scenes and average path lengths per chapter."""
+    n = stats["playthroughs"]
+    print(f"{n} playthroughs in {elapsed:.2f} s ({n / elapsed * 60:,.0f} per minute)")
+    print(f"Wins: {stats['wins']} ({stats['wins'] / n:.3%})  Lost: {stats['losses']}  "
+          f"Abandoned: {stats['abandoned']}  Average length: {stats['steps'] / n:.2f} choices, "
+          f"{stats['retries'] / n:.2f} retries")
+
+    print("\nMost common fail scenes (losses per playthrough, retried ones included):")
+    for name, count in stats["fails"].most_common(top):
+        print(f"  {count / n:8.3f}  {name}")
+
+    print("\nAverage choices per chapter (over playthroughs that reached it):")
+    for name, visits in stats["chapter_visits"].items():
+        print(f"  {stats['chapter_steps'][name] / visits:6.2f}  {name} ({visits} reached)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many playthroughs of a story.")
+    parser.add_argument("-n", "--playthroughs", type=int, default=100000)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--script", default=None, help="comma-separated choice indexes to play before going random")
+    parser.add_argument("--story", default=STORY_FILE, help="story file (default: story.json)")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES,
+                        help=f"times Try Again is used in each chapter before giving up (default {MAX_RETRIES})")
+    args = parser.parse_args()
+
+    script = [int(i) for i in args.script.split(",")] if args.script else None
+    started = time.perf_counter()
+    stats = run_batch(args.playthroughs, args.processes, args.seed, script, args.story,
+                      max_retries=args.max_retries)
+    print_report(stats, time.perf_counter() - started)
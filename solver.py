@@ -0,0 +1,274 @@
+# Hint solver: distance to victory and chance of winning for every reachable state
+#
+# Usage: python solver.py [story.json]   (writes story.hints next to the story)
+#
+# The table is keyed by scene name and item/companion masks, and remembers a
+# signature of every scene it was solved from. When the story changes, only
+# states whose scene can lead to a changed scene are solved again; the rest
+# are copied over, since nothing they can lead to has changed.
+import os
+import sys
+import json
+import zlib
+import heapq
+import struct
+import argparse
+from collections import deque
+from scene_graph import load_story, STORY_FILE, SCENE, WIN, LOSE
+from analyzer import static_edges
+from save_store import atomic_write
+
+MAGIC = b"CYOH"
+VERSION = 1
+UNWINNABLE = 0xFFFF # Distance stored for states that can't reach a win
+# Value iteration stops once no win chance moves by more than this in a sweep
+TOLERANCE = 1e-7
+MAX_SWEEPS = 10000
+
+# magic, version, length of the JSON metadata that follows
+_HEADER = struct.Struct("<4sHxxI")
+# scene (index into the metadata's scene list), item mask, companion mask, distance, win chance * 65535
+_RECORD = struct.Struct("<IQQHH")
+
+
+def hints_path(story_path):
+    """Where the hint table for a story file lives: next to it, with a .hints extension."""
+    return os.path.splitext(story_path)[0] + ".hints"
+
+
+def scene_signatures(story_path):
+    """Returns {scene name: CRC32 of its definition}, or None if the story file isn't available."""
+    try:
+        with open(story_path, 'r', encoding='utf-8') as f:
+            scenes = json.load(f)["scenes"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return {name: zlib.crc32(json.dumps(scene, sort_keys=True).encode("utf-8")) for name, scene in scenes.items()}
+
+
+def explore(story, starts=None):
+    """Returns {state: [next state for each available choice]} for every state reachable from starts.
+
+    States are (scene, items, companions). starts are (scene, chapter start,
+    items, companions) positions, the beginning of the story by default.
+    "Try Again" after a loss goes back to the chapter start with items and
+    companions kept, so the states only reachable that way are explored too.
+    A retry isn't progress towards a win, so lose scenes list no next states.
+    """
+    ends, effects, choices, chapter_starts = story.ends, story.effects, story.choices, story.chapter_start
+
+    def enter(target, chapter_start, items, companions):
+        # The same bookkeeping as StoryEngine.enter
+        if chapter_starts[target]:
+            chapter_start = target
+        if effects[target]:
+            items, companions = story.apply_effects(target, items, companions)
+        return (target, chapter_start, items, companions)
+
+    if starts is None:
+        starts = [enter(story.start, story.start, 0, 0)]
+    successors = {}
+    queue = deque(starts)
+    seen = set(starts)
+    while queue:
+        scene, chapter_start, items, companions = queue.popleft()
+        state = (scene, items, companions)
+        if ends[scene] == SCENE:
+            following = [enter(target, chapter_start, items, companions)
+                         for target in choices(scene, items, companions).values()]
+            successors[state] = [(position[0], position[2], position[3]) for position in following]
+        else:
+            successors[state] = []
+            following = [enter(chapter_start, chapter_start, items, companions)] if ends[scene] == LOSE else []
+        for position in following:
+            if position not in seen:
+                seen.add(position)
+                queue.append(position)
+    return successors
+
+
+def dirty_scenes(story, changed):
+    """Returns the scenes that can lead to any scene in changed, changed ones included."""
+    parents = [[] for _ in range(len(story))]
+    for scene, targets in enumerate(static_edges(story)):
+        for target in targets:
+            parents[target].append(scene)
+    dirty = set(changed)
+    stack = list(changed)
+    while stack:
+        for parent in parents[stack.pop()]:
+            if parent not in dirty:
+                dirty.add(parent)
+                stack.append(parent)
+    return dirty
+
+
+def solve(story, known=None, starts=None):
+    """Returns {state: (distance to a win or None, chance of winning by choosing at random)}.
+
+    Distances and chances count the ways to win without losing first. known
+    maps states to values that are still valid (from an earlier solve); those
+    are taken as they are and only the other states are worked out. starts
+    are passed on to explore().
+    """
+    known = known or {}
+    successors = explore(story, starts)
+    ends = story.ends
+    values = {}
+    unknown = []
+    for state in successors:
+        if state in known:
+            values[state] = known[state]
+        elif ends[state[0]] == WIN:
+            values[state] = (0, 1.0)
+        elif ends[state[0]] != SCENE:
+            values[state] = (None, 0.0)
+        else:
+            unknown.append(state)
+
+    # Distances: shortest path to a win, growing outwards from every settled state
+    parents = {state: [] for state in unknown}
+    for state in unknown:
+        for child in successors[state]:
+            if child in parents:
+                parents[child].append(state)
+    distance = {}
+    heap = []
+    for state in unknown:
+        for child in successors[state]:
+            settled = values.get(child)
+            if settled is not None and settled[0] is not None:
+                heap.append((settled[0] + 1, state))
+    heapq.heapify(heap)
+    while heap:
+        d, state = heapq.heappop(heap)
+        if state in distance:
+            continue
+        distance[state] = d
+        for parent in parents[state]:
+            if parent not in distance:
+                heapq.heappush(heap, (d + 1, parent))
+
+    # Win chances: value iteration, starting from 0 so endless loops count as losses
+    chance = {state: 0.0 for state in unknown}
+    for _ in range(MAX_SWEEPS):
+        largest_change = 0.0
+        for state in unknown:
+            children = successors[state]
+            if not children:
+                continue
+            total = 0.0
+            for child in children:
+                settled = values.get(child)
+                total += settled[1] if settled is not None else chance[child]
+            value = total / len(children)
+            change = abs(value - chance[state])
+            if change > largest_change:
+                largest_change = change
+            chance[state] = value
+        if largest_change < TOLERANCE:
+            break
+
+    for state in unknown:
+        values[state] = (distance.get(state), chance[state])
+    return values
+
+
+class HintTable:
+    """Answers "which choice gives me the best chance?" with a few dict lookups."""
+
+    def __init__(self, story, values):
+        self.story = story
+        self.values = values
+
+    def hints(self, scene, items, companions, chapter_start=None):
+        """Returns [(choice text, distance to a win or None, win chance)] for the choices in a scene.
+
+        A position the table doesn't cover (a save from an older version of
+        the story, say) is solved on the spot and remembered for the session.
+        """
+        story = self.story
+        choices = story.choices(scene, items, companions)
+        following = []
+        for target in choices.values():
+            if story.effects[target]:
+                following.append((target,) + story.apply_effects(target, items, companions))
+            else:
+                following.append((target, items, companions))
+        if any(state not in self.values for state in following):
+            start = (scene, scene if chapter_start is None else chapter_start, items, companions)
+            self.values.update(solve(story, self.values, [start]))
+        return [(text,) + self.values[state] for text, state in zip(choices, following)]
+
+    # --- Storage ---
+
+    def save(self, path, signatures):
+        story = self.story
+        names = list(story.names)
+        metadata = {"items": list(story.items.names), "companions": list(story.companions.names),
+                    "scenes": names, "signatures": signatures}
+        header = json.dumps(metadata).encode("utf-8")
+        records = [_RECORD.pack(scene, items, companions,
+                                UNWINNABLE if distance is None else min(distance, UNWINNABLE - 1),
+                                round(chance * 65535))
+                   for (scene, items, companions), (distance, chance) in self.values.items()]
+        atomic_write(path, _HEADER.pack(MAGIC, VERSION, len(header)) + header + b"".join(records))
+
+    @staticmethod
+    def _read(path):
+        """Returns (metadata, {(scene name, items, companions): value}) from a hints file, or None."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, version, length = _HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                return None
+            metadata = json.loads(data[_HEADER.size:_HEADER.size + length])
+        except (OSError, ValueError, struct.error):
+            return None
+        names = metadata["scenes"]
+        values = {}
+        for scene, items, companions, distance, chance in _RECORD.iter_unpack(data[_HEADER.size + length:]):
+            values[(names[scene], items, companions)] = (None if distance == UNWINNABLE else distance, chance / 65535)
+        return metadata, values
+
+    @classmethod
+    def load_or_solve(cls, story, story_path=STORY_FILE, save=True):
+        """Loads the stored table for a story, solving whatever changed since it was written."""
+        path = hints_path(story_path)
+        signatures = scene_signatures(story_path)
+        stored = cls._read(path)
+        known = {}
+        if stored is not None and signatures is not None:
+            metadata, stored_values = stored
+            old = metadata["signatures"]
+            if (metadata["items"] == list(story.items.names)
+                    and metadata["companions"] == list(story.companions.names)):
+                changed = [i for i, name in enumerate(story.names) if old.get(name) != signatures.get(name)]
+                dirty = dirty_scenes(story, changed)
+                for (name, items, companions), value in stored_values.items():
+                    scene = story.index.get(name)
+                    if scene is not None and scene not in dirty:
+                        known[(scene, items, companions)] = value
+        table = cls(story, solve(story, known))
+        if save and signatures is not None:
+            try:
+                table.save(path, signatures)
+            except OSError as e:
+                print(f"Warning: Could not save hints to {path}: {e}")
+        return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a story for the in-game Hint button.")
+    parser.add_argument("story", nargs="?", default=STORY_FILE, help="story file (default: story.json)")
+    args = parser.parse_args(argv)
+    story = load_story(args.story)
+    table = HintTable.load_or_solve(story, args.story)
+    winnable = sum(1 for distance, _ in table.values.values() if distance is not None)
+    print(f"Solved {len(table.values)} states ({winnable} can still win); wrote {hints_path(args.story)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+# Story bytecode: the compiled scene graph as one memory-mapped binary file
+#
+# Usage: python story_bytecode.py [story.json] [-o story.bin]
+#
+# Layout (all little-endian, tables found through offsets in the header):
+#   header        see _HEADER
+#   string table  u32 offsets (one more than there are strings) + UTF-8 blob;
+#                 every name, text, image and title is stored once
+#   scenes        fixed-size records, see _SCENE
+#   edges         fixed-size records, see _EDGE; a scene's edges are contiguous
+#   effects       fixed-size records, see _EFFECT; likewise
+#   conditions    u16 opcode + u16 argument per instruction: any number of
+#                 OP_NOT followed by one leaf (item, companion, companions_below)
+#   items         u32 string ids, in bit order; likewise companions
+#   name index    open-addressed hash table of scene number + 1 (0 = empty),
+#                 keyed by CRC32 of the scene name
+import os
+import sys
+import mmap
+import json
+import zlib
+import struct
+import argparse
+from scene_graph import SceneGraph, STORY_FILE, fingerprint_of, load_story
+from game_state import Registry, count_flags
+from save_store import atomic_write
+
+MAGIC = b"CYOB"
+VERSION = 1
+NONE = 0xFFFFFFFF # No condition
+
+OP_ITEM = 1
+OP_COMPANION = 2
+OP_COMPANIONS_BELOW = 3
+OP_NOT = 4
+
+KIND_ITEM = 0
+KIND_COMPANION = 1
+
+# magic, version, source size, source mtime (ns), fingerprint, title, start,
+# counts (strings, scenes, edges, effects, instructions, items, companions, index slots),
+# offsets (string offsets, string blob, scenes, edges, effects, conditions, items, companions, index)
+_HEADER = struct.Struct("<4sHxxQQIII8I9I")
+# name, image, text, end kind, chapter start flag, first edge, first effect, edge count, effect count
+_SCENE = struct.Struct("<IIIBBxxIIHH")
+# text, target, else target, when condition, if condition
+_EDGE = struct.Struct("<IIIII")
+# kind, bit number, condition
+_EFFECT = struct.Struct("<BxHI")
+_INSTRUCTION = struct.Struct("<HH")
+_U32 = struct.Struct("<I")
+
+# Byte positions of the end kind and chapter start flag within a scene record
+_SCENE_END = 12
+_SCENE_CHAPTER_START = 13
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def compiled_path(story_path):
+    """Where the bytecode for a story file lives: next to it, with a .bin extension."""
+    return os.path.splitext(story_path)[0] + ".bin"
+
+
+# --- Compiler ---
+
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+        self.blob = bytearray()
+        self.offsets = [0]
+
+    def add(self, text):
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = self.ids[text] = len(self.offsets) - 1
+            self.blob += text.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return sid
+
+
+def compile_story(story_path=STORY_FILE, out_path=None):
+    """Compiles a story file to bytecode. Returns the path written.
+
+    The story is compiled into a SceneGraph first, so it's checked the same
+    way and item/companion bits come out identical.
+    """
+    out_path = out_path or compiled_path(story_path)
+    with open(story_path, 'r', encoding='utf-8') as f:
+        story = json.load(f)
+    graph = SceneGraph(story)
+    strings = _Strings()
+    scenes, edges, effects, code = bytearray(), bytearray(), bytearray(), []
+
+    def condition(cond):
+        if cond is None:
+            return NONE
+        start = len(code)
+        while "not" in cond:
+            code.append((OP_NOT, 0))
+            cond = cond["not"]
+        if "item" in cond:
+            code.append((OP_ITEM, graph.items.bit(cond["item"]).bit_length() - 1))
+        elif "companion" in cond:
+            code.append((OP_COMPANION, graph.companions.bit(cond["companion"]).bit_length() - 1))
+        elif "companions_below" in cond:
+            code.append((OP_COMPANIONS_BELOW, cond["companions_below"]))
+        else:
+            raise ValueError(f"Unknown story condition: {cond}")
+        return start
+
+    edge_count = effect_count = 0
+    for name, scene in story["scenes"].items():
+        choices, scene_effects = scene.get("choices", ()), scene.get("effects", ())
+        scenes += _SCENE.pack(strings.add(name), strings.add(scene["image"]), strings.add(scene["text"]),
+                              graph.ends[graph.index[name]], bool(scene.get("chapter_start")),
+                              edge_count, effect_count, len(choices), len(scene_effects))
+        for choice in choices:
+            target = graph.index[choice["to"]]
+            else_target = graph.index[choice["else"]] if choice.get("if") is not None else target
+            edges += _EDGE.pack(strings.add(choice["text"]), target, else_target,
+                                condition(choice.get("when")), condition(choice.get("if")))
+        for effect in scene_effects:
+            if "add_item" in effect:
+                kind, bit = KIND_ITEM, graph.items.bit(effect["add_item"])
+            else:
+                kind, bit = KIND_COMPANION, graph.companions.bit(effect["add_companion"])
+            effects += _EFFECT.pack(kind, bit.bit_length() - 1, condition(effect.get("if")))
+        edge_count += len(choices)
+        effect_count += len(scene_effects)
+
+    title = strings.add(story.get("title", ""))
+    items = b"".join(_U32.pack(strings.add(name)) for name in graph.items.names)
+    companions = b"".join(_U32.pack(strings.add(name)) for name in graph.companions.names)
+
+    slots = 1 << (2 * len(graph) - 1).bit_length() # At most half full
+    table = [0] * slots
+    for i, name in enumerate(graph.names):
+        slot = zlib.crc32(name.encode("utf-8")) & (slots - 1)
+        while table[slot]:
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = i + 1
+
+    sections = [
+        struct.pack(f"<{len(strings.offsets)}I", *strings.offsets),
+        bytes(strings.blob),
+        bytes(scenes), bytes(edges), bytes(effects),
+        b"".join(_INSTRUCTION.pack(op, arg) for op, arg in code),
+        items, companions,
+        struct.pack(f"<{slots}I", *table),
+    ]
+    offsets, position = [], _HEADER.size
+    for section in sections:
+        position += -position % 4 # Keep every table 4-byte aligned for memoryview casts
+        offsets.append(position)
+        position += len(section)
+
+    source_size, source_mtime = _source_stamp(story_path)
+    header = _HEADER.pack(MAGIC, VERSION, source_size, source_mtime, fingerprint_of(graph.names), title, graph.start,
+                          len(strings.offsets) - 1, len(graph), edge_count, effect_count, len(code),
+                          len(graph.items), len(graph.companions), slots, *offsets)
+    data = bytearray(header)
+    for offset, section in zip(offsets, sections):
+        data += b"\0" * (offset - len(data))
+        data += section
+    atomic_write(out_path, bytes(data))
+    return out_path
+
+
+# --- Loader ---
+
+class _Column(dict):
+    """A read-only, lazily decoded sequence: item i is built by decode(i) on first use, then cached.
+
+    It's a dict underneath so that, once cached, story.edges[scene] and the
+    like are a plain C-level lookup.
+    """
+    __slots__ = ("_decode", "_length")
+
+    def __init__(self, decode, length):
+        super().__init__()
+        self._decode = decode
+        self._length = length
+
+    def __missing__(self, i):
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        value = self[i] = self._decode(i)
+        return value
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+
+class _NameIndex:
+    """Scene name -> scene number, through the hash table in the file."""
+    __slots__ = ("_story",)
+
+    def __init__(self, story):
+        self._story = story
+
+    def get(self, name, default=None):
+        story = self._story
+        mask = story._slots - 1
+        slot = zlib.crc32(name.encode("utf-8")) & mask
+        while True:
+            entry = story._index_table[slot]
+            if entry == 0:
+                return default
+            if story.names[entry - 1] == name:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def __getitem__(self, name):
+        i = self.get(name)
+        if i is None:
+            raise KeyError(name)
+        return i
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return len(self._story)
+
+
+class CompiledStory(SceneGraph):
+    """A SceneGraph backed by a memory-mapped bytecode file.
+
+    Opening one reads only the header, so it costs the same for any size of
+    story. Scenes, strings, edges and conditions are decoded the first time
+    they're used and cached, so revisiting a scene builds nothing new.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = _HEADER.unpack_from(self._map)
+        magic, version = fields[0], fields[1]
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not story bytecode this version of the game can read")
+        (self.source_size, self.source_mtime, self.fingerprint, title, self.start,
+         n_strings, n_scenes, n_edges, n_effects, n_code, n_items, n_companions, self._slots,
+         *offsets) = fields[2:]
+        (strings_at, blob_at, self._scenes_at, self._edges_at, self._effects_at,
+         code_at, items_at, companions_at, index_at) = offsets
+        view = memoryview(self._map)
+        self._string_offsets = view[strings_at:strings_at + 4 * (n_strings + 1)].cast("I")
+        self._blob_at = blob_at
+        self._code = view[code_at:code_at + 4 * n_code].cast("H")
+        self._item_names = view[items_at:items_at + 4 * n_items].cast("I")
+        self._companion_names = view[companions_at:companions_at + 4 * n_companions].cast("I")
+        self._index_table = view[index_at:index_at + 4 * self._slots].cast("I")
+        self._n_scenes = n_scenes
+
+        self._strings = _Column(self._string, n_strings)
+        self.title = self._strings[title]
+        self.names = _Column(lambda i: self._strings[self._scene(i)[0]], n_scenes)
+        self.images = _Column(lambda i: self._strings[self._scene(i)[1]], n_scenes)
+        self.texts = _Column(lambda i: self._strings[self._scene(i)[2]], n_scenes)
+        # Strided views of one byte of every scene record, indexed without any decoding
+        scenes_end = self._scenes_at + n_scenes * _SCENE.size
+        self.ends = view[self._scenes_at + _SCENE_END:scenes_end:_SCENE.size]
+        self.chapter_start = view[self._scenes_at + _SCENE_CHAPTER_START:scenes_end:_SCENE.size]
+        self.edges = _Column(self._edges, n_scenes)
+        self.effects = _Column(self._effects, n_scenes)
+        self.index = _NameIndex(self)
+        self._conditions = {}
+        self._items = self._companions = None
+
+    def __len__(self):
+        return self._n_scenes
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = Registry(self._strings[sid] for sid in self._item_names)
+        return self._items
+
+    @property
+    def companions(self):
+        if self._companions is None:
+            self._companions = Registry(self._strings[sid] for sid in self._companion_names)
+        return self._companions
+
+    def is_current(self, story_path):
+        """True if the bytecode was compiled from the story file as it is now."""
+        try:
+            return _source_stamp(story_path) == (self.source_size, self.source_mtime)
+        except FileNotFoundError:
+            return True # Only the bytecode is installed
+
+    def _string(self, sid):
+        start = self._blob_at + self._string_offsets[sid]
+        end = self._blob_at + self._string_offsets[sid + 1]
+        return sys.intern(str(self._map[start:end], "utf-8"))
+
+    def _scene(self, i):
+        return _SCENE.unpack_from(self._map, self._scenes_at + i * _SCENE.size)
+
+    def _condition(self, at):
+        """Returns the predicate for the condition code at instruction at, or None."""
+        if at == NONE:
+            return None
+        predicate = self._conditions.get(at)
+        if predicate is None:
+            code = self._code
+            negate = False
+            pc = at
+            while code[2 * pc] == OP_NOT:
+                negate = not negate
+                pc += 1
+            op, arg = code[2 * pc], code[2 * pc + 1]
+            flag = 1 << arg
+            if op == OP_ITEM:
+                predicate = lambda item_mask, companion_mask: bool(item_mask & flag)
+            elif op == OP_COMPANION:
+                predicate = lambda item_mask, companion_mask: bool(companion_mask & flag)
+            elif op == OP_COMPANIONS_BELOW:
+                predicate = lambda item_mask, companion_mask: count_flags(companion_mask) < arg
+            else:
+                raise ValueError(f"Bad condition opcode {op} in {self.path}")
+            if negate:
+                inner = predicate
+                predicate = lambda item_mask, companion_mask: not inner(item_mask, companion_mask)
+            self._conditions[at] = predicate
+        return predicate
+
+    def _edges(self, i):
+        _, _, _, _, _, first, _, count, _ = self._scene(i)
+        edges = []
+        for n in range(first, first + count):
+            text, target, else_target, when, condition = _EDGE.unpack_from(self._map, self._edges_at + n * _EDGE.size)
+            edges.append((self._strings[text], self._condition(when), target, self._condition(condition), else_target))
+        return tuple(edges)
+
+    def _effects(self, i):
+        _, _, _, _, _, _, first, _, count = self._scene(i)
+        effects = []
+        for n in range(first, first + count):
+            kind, bit, condition = _EFFECT.unpack_from(self._map, self._effects_at + n * _EFFECT.size)
+            flag = 1 << bit
+            effects.append((flag if kind == KIND_ITEM else 0, flag if kind == KIND_COMPANION else 0,
+                            self._condition(condition)))
+        return tuple(effects)
+
+
+def load_compiled(story_path=STORY_FILE):
+    """Returns the CompiledStory for a story file if its bytecode is up to date, else None."""
+    path = compiled_path(story_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        story = CompiledStory(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Warning: Ignoring story bytecode {path}: {e}")
+        return None
+    return story if story.is_current(story_path) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a story file to bytecode for fast startup.")
+    parser.add_argument("story", nargs="?", default=STORY_FILE, help="story file (default: story.json)")
+    parser.add_argument("-o", "--out", help="bytecode file to write (default: next to the story, .bin)")
+    parser.add_argument("--no-hints", action="store_true", help="don't update the hint table (see solver.py)")
+    args = parser.parse_args(argv)
+    out_path = compile_story(args.story, args.out)
+    print(f"Compiled {args.story} to {out_path} ({os.path.getsize(out_path) / 1024:.1f} KB)")
+    if not args.no_hints:
+        # Only the scenes that changed since the last compile (and those leading to them) are solved again
+        from solver import HintTable, hints_path
+        HintTable.load_or_solve(load_story(args.story), args.story)
+        print(f"Updated hints in {hints_path(args.story)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
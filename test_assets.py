@@ -0,0 +1,371 @@
+# Tests for the asset downloader, against asset_server.py's local HTTP stand-in, and the asset store
+#
+# Usage: python -m pytest test_assets.py   (or python -m unittest test_assets)
+import os
+import json
+import time
+import zlib
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from asset_server import start_asset_server, AssetHandler
+from assets import Downloader, read_meta, META_SUFFIX
+from asset_store import AssetStore
+
+PAYLOAD = bytes(range(256)) * 4096 # 1 MB, so a dropped connection leaves several chunks behind
+
+
+class DroppingHandler(AssetHandler):
+    """Sends only the first half of the body for the first `drops` requests, then hangs up."""
+    drops = 1
+
+    def do_GET(self):
+        type(self).ranges.append(self.headers.get("Range"))
+        if len(type(self).ranges) > self.drops:
+            return super().do_GET()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.payload)))
+        self.send_header("ETag", f'"{zlib.crc32(self.payload):08x}"')
+        self.end_headers()
+        self.wfile.write(self.payload[:len(self.payload) // 2])
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class IgnoresRangeHandler(AssetHandler):
+    """Always answers with the whole asset and a 200, whatever Range asks for."""
+
+    def do_GET(self):
+        type(self).ranges.append(self.headers.get("Range"))
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.payload)))
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+
+class RangeNotSatisfiableHandler(AssetHandler):
+    """Answers any Range request with a 416 for an asset of `size` bytes."""
+    size = 0
+
+    def do_GET(self):
+        type(self).ranges.append(self.headers.get("Range"))
+        if not self.headers.get("Range"):
+            return super().do_GET()
+        self.send_response(416)
+        self.send_header("Content-Range", f"bytes */{self.size}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class FailingHandler(AssetHandler):
+    """Answers every request with a 500."""
+
+    def do_GET(self):
+        type(self).ranges.append(self.headers.get("Range"))
+        self.send_response(500)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class LoggingHandler(AssetHandler):
+    """Serves the asset normally, logging the If-None-Match header of every request."""
+
+    def do_GET(self):
+        type(self).etags.append(self.headers.get("If-None-Match"))
+        super().do_GET()
+
+
+class SlowHandler(AssetHandler):
+    """Takes DELAY seconds before answering, recording the most requests it had in flight at once."""
+    DELAY = 0.3
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def do_GET(self):
+        handler = type(self)
+        with handler.lock:
+            handler.in_flight += 1
+            handler.peak = max(handler.peak, handler.in_flight)
+        try:
+            time.sleep(self.DELAY)
+            super().do_GET()
+        finally:
+            with handler.lock:
+                handler.in_flight -= 1
+
+
+class BrokenStore:
+    """An asset store whose disk is full: has nothing, and can't add anything."""
+
+    def __init__(self):
+        self.added = []
+
+    def materialize(self, key, path):
+        return False
+
+    def add(self, key, path):
+        self.added.append(key)
+        raise OSError(28, "No space left on device")
+
+
+class ServerTestCase(unittest.TestCase):
+    """Runs each test in its own temporary folder, against local servers started with serve()."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = self._tmp.name
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self._tmp.cleanup()
+
+    def serve(self, handler=AssetHandler, payload=PAYLOAD, **attributes):
+        # Each test gets its own subclass, so request logs aren't shared between tests
+        handler = type(handler.__name__, (handler,), dict(ranges=[], **attributes))
+        server = start_asset_server(payload, handler)
+        self.servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}", server.RequestHandlerClass
+
+    def fetch(self, downloader, url, path):
+        with redirect_stdout(StringIO()):
+            return downloader.fetch(url, path)
+
+
+class DownloaderTest(ServerTestCase):
+
+    def test_fetch_all_downloads_in_parallel(self):
+        base, handler = self.serve(SlowHandler)
+        manifest = [{"kind": "image", "name": f"{i}.png", "url": f"{base}/{i}.png",
+                     "path": os.path.join(self.dir, "images", f"{i}.png")} for i in range(4)]
+        with redirect_stdout(StringIO()):
+            failed = Downloader(max_workers=4).fetch_all(manifest)
+        self.assertEqual(failed, [])
+        for entry in manifest:
+            with open(entry["path"], 'rb') as f:
+                self.assertEqual(f.read(), PAYLOAD)
+        # One after another, there would never be more than one request in flight
+        self.assertGreater(handler.peak, 1)
+
+    def test_resumes_with_range_after_dropped_connection(self):
+        base, handler = self.serve(DroppingHandler)
+        path = os.path.join(self.dir, "art.png")
+        self.assertTrue(self.fetch(Downloader(retries=2), f"{base}/art.png", path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertEqual(len(handler.ranges), 2)
+        self.assertIsNone(handler.ranges[0])
+        # Picks up from the last whole chunk that arrived
+        offset = int(handler.ranges[1][len("bytes="):-1])
+        self.assertTrue(0 < offset <= len(PAYLOAD) // 2)
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def leave_part(self, path, data, url, etag):
+        """Leaves a partial download behind, as an interrupted attempt would."""
+        with open(path + ".part", 'wb') as f:
+            f.write(data)
+        with open(path + ".part" + META_SUFFIX, 'w') as f:
+            json.dump({"url": url, "etag": etag, "last_modified": None}, f)
+
+    def test_starts_over_when_server_ignores_range(self):
+        base, handler = self.serve(IgnoresRangeHandler)
+        path = os.path.join(self.dir, "art.png")
+        self.leave_part(path, b"left over from an earlier attempt", f"{base}/art.png", '"1"')
+        self.assertTrue(self.fetch(Downloader(), f"{base}/art.png", path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertEqual(handler.ranges, ["bytes=33-"])
+
+    def test_part_of_an_older_version_is_not_continued(self):
+        base, handler = self.serve(LoggingHandler, etags=[])
+        path = os.path.join(self.dir, "art.png")
+        self.leave_part(path, b"the first half of last week's art", f"{base}/art.png", '"last-week"')
+        self.assertTrue(self.fetch(Downloader(), f"{base}/art.png", path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertFalse(os.path.exists(path + ".part" + META_SUFFIX))
+
+    def test_part_without_validators_is_not_continued(self):
+        base, handler = self.serve(DroppingHandler, drops=0)
+        path = os.path.join(self.dir, "art.png")
+        with open(path + ".part", 'wb') as f:
+            f.write(b"from who knows which version")
+        self.assertTrue(self.fetch(Downloader(), f"{base}/art.png", path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertEqual(handler.ranges, [None])
+
+    def test_416_for_another_size_starts_over(self):
+        base, handler = self.serve(RangeNotSatisfiableHandler, size=len(PAYLOAD))
+        path = os.path.join(self.dir, "art.png")
+        etag = f'"{zlib.crc32(PAYLOAD):08x}"'
+        self.leave_part(path, PAYLOAD + b"junk", f"{base}/art.png", etag)
+        self.assertTrue(self.fetch(Downloader(retries=2), f"{base}/art.png", path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertEqual(handler.ranges, [f"bytes={len(PAYLOAD) + 4}-", None])
+
+    def test_416_for_a_complete_part_finishes_it(self):
+        base, handler = self.serve(RangeNotSatisfiableHandler, size=len(PAYLOAD))
+        path = os.path.join(self.dir, "art.png")
+        etag = f'"{zlib.crc32(PAYLOAD):08x}"'
+        self.leave_part(path, PAYLOAD, f"{base}/art.png", etag)
+        self.assertTrue(self.fetch(Downloader(), f"{base}/art.png", path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertEqual(len(handler.ranges), 1)
+        self.assertEqual(read_meta(path)["etag"], etag)
+
+    def test_gives_up_after_retries(self):
+        base, handler = self.serve(FailingHandler)
+        path = os.path.join(self.dir, "art.png")
+        self.assertFalse(self.fetch(Downloader(retries=3), f"{base}/art.png", path))
+        self.assertEqual(len(handler.ranges), 3)
+        self.assertFalse(os.path.exists(path))
+
+    def test_never_leaves_a_truncated_file(self):
+        base, _ = self.serve(DroppingHandler, drops=100)
+        path = os.path.join(self.dir, "art.png")
+        self.assertFalse(self.fetch(Downloader(retries=1), f"{base}/art.png", path))
+        self.assertFalse(os.path.exists(path))
+        # The partial download is kept aside for the next attempt to resume
+        self.assertTrue(0 < os.path.getsize(path + ".part") <= len(PAYLOAD) // 2)
+
+    def test_store_failure_does_not_download_again(self):
+        base, handler = self.serve(DroppingHandler, drops=0)
+        path = os.path.join(self.dir, "art.png")
+        store = BrokenStore()
+        self.assertTrue(self.fetch(Downloader(store=store), f"{base}/art.png", path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertEqual(len(handler.ranges), 1)
+        self.assertEqual(store.added, [f"{base}/art.png"])
+
+
+class RevalidateTest(ServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.base, self.handler = self.serve(LoggingHandler, etags=[])
+        self.entry = {"kind": "image", "url": f"{self.base}/art.png", "path": os.path.join(self.dir, "art.png")}
+
+    def revalidate(self, downloader):
+        with redirect_stdout(StringIO()):
+            return downloader.revalidate(self.entry)
+
+    def downloaded(self):
+        """Fetches the entry, then forgets the request that took."""
+        self.assertTrue(self.fetch(Downloader(), self.entry["url"], self.entry["path"]))
+        del self.handler.etags[:]
+
+    def content(self):
+        with open(self.entry["path"], 'rb') as f:
+            return f.read()
+
+    def test_not_checked_before_due(self):
+        self.downloaded()
+        self.assertFalse(self.revalidate(Downloader()))
+        self.assertEqual(self.handler.etags, [])
+
+    def test_unchanged_asset_gets_304(self):
+        self.downloaded()
+        checked = read_meta(self.entry["path"])["checked"]
+        self.assertFalse(self.revalidate(Downloader(revalidate_after={"image": 0})))
+        self.assertEqual(len(self.handler.etags), 1)
+        self.assertEqual(self.handler.etags[0], read_meta(self.entry["path"])["etag"])
+        self.assertGreaterEqual(read_meta(self.entry["path"])["checked"], checked)
+        self.assertEqual(self.content(), PAYLOAD)
+
+    def test_changed_asset_is_replaced(self):
+        self.downloaded()
+        self.handler.payload = PAYLOAD[::-1]
+        downloader = Downloader(revalidate_after={"image": 0})
+        self.assertTrue(self.revalidate(downloader))
+        self.assertEqual(self.content(), PAYLOAD[::-1])
+        # The new version's validators are saved, so the next check is a 304
+        self.assertFalse(self.revalidate(downloader))
+        self.assertEqual(len(self.handler.etags), 2)
+
+    def test_files_without_meta_are_left_alone(self):
+        with open(self.entry["path"], 'wb') as f:
+            f.write(b"the player's own art")
+        self.assertFalse(self.revalidate(Downloader(revalidate_after={"image": 0})))
+        self.assertEqual(self.handler.etags, [])
+        self.assertEqual(self.content(), b"the player's own art")
+
+    def test_files_without_validators_are_left_alone(self):
+        self.downloaded()
+        meta = read_meta(self.entry["path"])
+        with open(self.entry["path"] + META_SUFFIX, 'w') as f:
+            json.dump(dict(meta, etag=None, last_modified=None), f)
+        self.assertFalse(self.revalidate(Downloader(revalidate_after={"image": 0})))
+        self.assertEqual(self.handler.etags, [])
+
+    def test_edited_files_are_left_alone(self):
+        self.downloaded()
+        with open(self.entry["path"], 'ab') as f:
+            f.write(b"touched up")
+        self.assertFalse(self.revalidate(Downloader(revalidate_after={"image": 0})))
+        self.assertEqual(self.handler.etags, [])
+        self.assertEqual(self.content(), PAYLOAD + b"touched up")
+
+    def test_nothing_is_checked_after_close(self):
+        self.downloaded()
+        downloader = Downloader(revalidate_after={"image": 0})
+        downloader.close()
+        self.assertEqual(downloader.revalidate_all([self.entry]), [])
+        self.assertEqual(self.handler.etags, [])
+
+
+class AssetStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = self._tmp.name
+        self.store = AssetStore(os.path.join(self.dir, "store"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_editing_a_file_leaves_the_store_and_other_names_alone(self):
+        woods = self.write("deep_woods.png", PAYLOAD)
+        digest = self.store.add("woods", woods)
+        night = os.path.join(self.dir, "forest_night.png")
+        self.assertTrue(self.store.materialize("woods", night))
+        obj = self.store.object_path(digest)
+        self.assertEqual(os.stat(obj).st_mode & 0o222, 0)
+        for path in (woods, night):
+            self.assertFalse(os.path.samefile(path, obj))
+        with open(woods, 'r+b') as f:
+            f.write(b"EDITED!!")
+        self.assertEqual(self.read(night), PAYLOAD)
+        self.assertTrue(AssetStore(self.store.root).verify(digest))
+
+    def test_old_hard_links_are_broken_on_verify(self):
+        woods = self.write("deep_woods.png", PAYLOAD)
+        digest = self.store.add("woods", woods)
+        obj = self.store.object_path(digest)
+        os.remove(woods)
+        os.link(obj, woods) # What older versions handed out
+        self.assertTrue(AssetStore(self.store.root).verify(digest))
+        self.assertFalse(os.path.samefile(woods, obj))
+        self.assertEqual(os.stat(obj).st_nlink, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Shared fonts and cached line breaking for the story text
+from collections import OrderedDict
+from tkinter import font as tkFont
+from instrumentation import PROFILER
+
+# Every font the game uses, by role: (family, size, weight)
+FONT_SPECS = {
+    "story": ("Helvetica", 14, "normal"),
+    "button": ("Helvetica", 12, "normal"),
+    "title": ("Papyrus", 32, "bold"),
+    "heading": ("Helvetica", 24, "bold"),
+    "status": ("Courier", 10, "bold"),
+    "overlay": ("Courier", 9, "normal"),
+}
+# Wrapped texts remembered; the whole story fits several times over
+LAYOUT_CACHE_SIZE = 1024
+
+
+class FontRegistry:
+    """Creates each font the first time it's asked for and hands out the same object after that."""
+
+    def __init__(self, root, specs=FONT_SPECS):
+        self.root = root
+        self.specs = specs
+        self._fonts = {}
+
+    def __getitem__(self, name):
+        font = self._fonts.get(name)
+        if font is None:
+            family, size, weight = self.specs[name]
+            font = self._fonts[name] = tkFont.Font(root=self.root, family=family, size=size, weight=weight)
+        return font
+
+
+class TextLayout:
+    """Breaks text into lines that fit a pixel width, cached by (text, font, width).
+
+    The result has its line breaks written in, so a label showing it never
+    has to wrap it again. Word widths are cached per font too, so even a new
+    text mostly reuses measurements. Layouts are timed as "text layout" for
+    the --profile overlay.
+    """
+
+    def __init__(self, fonts, max_entries=LAYOUT_CACHE_SIZE):
+        self.fonts = fonts
+        self.max_entries = max_entries
+        self._layouts = OrderedDict() # (text, font name, width) -> wrapped text
+        self._widths = {} # (font name, word) -> width in pixels
+
+    def _width(self, font_name, word):
+        key = (font_name, word)
+        width = self._widths.get(key)
+        if width is None:
+            width = self._widths[key] = self.fonts[font_name].measure(word)
+        return width
+
+    def wrap(self, text, font_name, width):
+        """Returns text with line breaks added so no line is wider than width pixels."""
+        with PROFILER.phase("text layout"):
+            key = (text, font_name, width)
+            wrapped = self._layouts.get(key)
+            if wrapped is not None:
+                self._layouts.move_to_end(key)
+                return wrapped
+            wrapped = self._layouts[key] = "\n".join(self._break_paragraph(paragraph, font_name, width)
+                                                     for paragraph in text.split("\n"))
+            if len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+            return wrapped
+
+    def _break_paragraph(self, paragraph, font_name, width):
+        """Greedy word wrap, the same way Tk's wraplength breaks lines."""
+        space = self._width(font_name, " ")
+        lines, line, line_width = [], [], 0
+        for word in paragraph.split(" "):
+            word_width = self._width(font_name, word)
+            if line and line_width + space + word_width > width:
+                lines.append(" ".join(line))
+                line, line_width = [], 0
+            if line:
+                line_width += space
+            line.append(word)
+            line_width += word_width
+        lines.append(" ".join(line))
+        return "\n".join(lines)